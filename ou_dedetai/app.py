@@ -12,6 +12,7 @@ from ou_dedetai.constants import (
     PROMPT_OPTION_DIRECTORY,
     PROMPT_OPTION_FILE
 )
+from ou_dedetai.telemetry import DownloadEvent
 
 
 class App(abc.ABC):
@@ -29,6 +30,9 @@ class App(abc.ABC):
     _last_status: Optional[str] = None
     """The last status we had"""
     config_updated_hooks: list[Callable[[], None]] = []
+    download_progress_hooks: list[Callable[[DownloadEvent], None]] = []
+    """Called with every progress event of every download, from the downloading
+    thread"""
     _config_updated_event: threading.Event = threading.Event()
 
     def __init__(self, config, **kwargs) -> None:
@@ -216,6 +220,23 @@ class App(abc.ABC):
             self._status(message, percent)
         self._last_status = message
 
+    def download_progress(self, event: DownloadEvent):
+        """A download's progress, see telemetry.DownloadEvent
+
+        Passed on to download_progress_hooks, and shown as the status.
+        """
+        for hook in self.download_progress_hooks:
+            try:
+                hook(event)
+            except Exception:
+                logging.exception("Failed to run download progress hook")
+        # While we could use the percent, it's likely to interfere
+        # With whatever install step we are on
+        if event.finished:
+            self.status(event.describe())
+        else:
+            self.status(event.describe() + "\r")
+
     @abc.abstractmethod
     def _status(self, message: str, percent: Optional[int] = None):
         """Implementation for updating status pre-front end
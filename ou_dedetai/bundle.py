@@ -0,0 +1,174 @@
+"""Offline bundles of everything an install downloads.
+
+A bundle is a single tar archive holding the product installer, the recommended wine
+AppImage and the ICU data files, along with a manifest of where each came from, its
+size and digests, and the network cache entries an install looks up. Importing one
+seeds the download directory and network cache, so the install needs no network.
+"""
+
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+from pathlib import Path
+
+from ou_dedetai.app import App
+
+from . import constants
+from . import network
+
+
+MANIFEST_NAME = "manifest.json"
+BUNDLE_FORMAT = 1
+"""Version of the manifest layout, bumped on incompatible changes"""
+
+
+def _artifacts(app: App) -> list[tuple[str, str]]:
+    """Returns the url and file name of each file an install downloads"""
+    return [
+        (
+            app.conf.faithlife_installer_download_url,
+            app.conf.faithlife_installer_name
+        ),
+        (
+            app.conf.wine_appimage_recommended_url,
+            app.conf.wine_appimage_recommended_file_name
+        ),
+        (
+            app.conf.icu_latest_version_url,
+            app.conf.icu_latest_version_file_name
+        ),
+    ]
+
+
+def export_bundle(app: App, bundle_path: str):
+    """Downloads (or reuses) every file an install needs and writes them to a bundle
+    """
+    app.status("Gathering files for the bundle…", 0)
+    # Looked up by the update check on startup, make sure it's cached too
+    app.conf.app_latest_version
+    artifacts = _artifacts(app)
+    manifest: dict = {
+        "format": BUNDLE_FORMAT,
+        "created": time.time(),
+        "created_by": f"{constants.APP_NAME} {constants.LLI_CURRENT_VERSION}",
+        "faithlife_product": app.conf.faithlife_product,
+        "faithlife_product_version": app.conf.faithlife_product_version,
+        "faithlife_product_release": app.conf.faithlife_product_release,
+        "artifacts": [],
+    }
+    for i, (url, file_name) in enumerate(artifacts):
+        app.status(f"Ensuring {file_name} is downloaded…", 80 * i // len(artifacts))
+        network.logos_reuse_download(url, file_name, app.conf.download_dir, app=app)
+        file_props = network.FileProps(Path(app.conf.download_dir) / file_name)
+        manifest["artifacts"].append({
+            "file": file_name,
+            "url": url,
+            "size": file_props.size,
+            "md5": file_props.md5,
+            "sha256": file_props.sha256,
+        })
+    manifest["network_cache"] = app.conf._network.export_cache()
+
+    app.status(f"Writing {bundle_path}…", 80)
+    path = Path(bundle_path).expanduser()
+    temp_path = path.with_name(f"{path.name}.part")
+    try:
+        with tarfile.open(temp_path, "w") as tar:
+            # The manifest goes first so it can be read without scanning the archive
+            data = json.dumps(manifest, indent=4, sort_keys=True).encode()
+            info = tarfile.TarInfo(MANIFEST_NAME)
+            info.size = len(data)
+            info.mtime = int(manifest["created"])
+            tar.addfile(info, io.BytesIO(data))
+            for artifact in manifest["artifacts"]:
+                tar.add(
+                    Path(app.conf.download_dir) / artifact["file"],
+                    arcname=artifact["file"]
+                )
+        os.replace(temp_path, path)
+    except OSError as e:
+        temp_path.unlink(missing_ok=True)
+        app.exit(f"Failed to write bundle {path}: {e}")
+    app.status(f"Bundle written to {path}", 100)
+
+
+def import_bundle(app: App, bundle_path: str):
+    """Verifies a bundle's files and seeds the download directory and network cache
+    with them"""
+    path = Path(bundle_path).expanduser()
+    app.status(f"Reading {path}…", 0)
+    try:
+        tar = tarfile.open(path, "r:*")
+    except (OSError, tarfile.TarError) as e:
+        app.exit(f"Failed to open bundle {path}: {e}")
+    with tar:
+        try:
+            manifest_file = tar.extractfile(MANIFEST_NAME)
+            if manifest_file is None:
+                raise KeyError(MANIFEST_NAME)
+            manifest: dict = json.load(manifest_file)
+        except (KeyError, json.JSONDecodeError) as e:
+            app.exit(f"{path} is not a valid bundle: {e}")
+        if manifest.get("format") != BUNDLE_FORMAT:
+            app.exit(f"Unsupported bundle format: {manifest.get('format')}")
+
+        artifacts: list[dict] = manifest.get("artifacts", [])
+        for i, artifact in enumerate(artifacts):
+            file_name = artifact["file"]
+            app.status(f"Verifying {file_name}…", 90 * i // len(artifacts))
+            if Path(file_name).name != file_name:
+                app.exit(f"Refusing to import {file_name} outside of the download directory")  # noqa: E501
+            target = Path(app.conf.download_dir) / file_name
+            target_props = network.FileProps(target)
+            if (
+                target_props.size == artifact["size"]
+                and target_props.md5 == artifact["md5"]
+            ):
+                logging.info(f"{file_name} is already in {app.conf.download_dir}")
+                continue
+            _extract_verified(app, tar, artifact, target)
+
+    app.status("Seeding the network cache…", 90)
+    app.conf._network.import_cache(manifest.get("network_cache", {}))
+    # Select what's in the bundle, unless a product was already chosen
+    if app.conf._raw.faithlife_product is None:
+        app.conf.faithlife_product = manifest["faithlife_product"]
+        app.conf.faithlife_product_version = manifest["faithlife_product_version"]
+        app.conf.faithlife_product_release = manifest["faithlife_product_release"]
+    app.status(f"Imported bundle {path}", 100)
+
+
+def _extract_verified(app: App, tar: tarfile.TarFile, artifact: dict, target: Path):
+    """Extracts an artifact into target, hashing it on the way.
+
+    Exits if it doesn't match the size and digests in the manifest.
+    """
+    file_name = artifact["file"]
+    temp_path = target.with_name(f"{target.name}.part")
+    hasher = network.FileHasher(sha256=True)
+    try:
+        source = tar.extractfile(file_name)
+        if source is None:
+            raise KeyError(file_name)
+        target.parent.mkdir(exist_ok=True, parents=True)
+        with source, temp_path.open("wb") as f:
+            while chunk := source.read(1024 * 1024):
+                f.write(chunk)
+                hasher.update(chunk)
+    except (KeyError, OSError, tarfile.TarError) as e:
+        temp_path.unlink(missing_ok=True)
+        app.exit(f"Failed to extract {file_name} from bundle: {e}")
+    if (
+        hasher.position != artifact["size"]
+        or hasher.md5 != artifact["md5"]
+        or hasher.sha256 != artifact["sha256"]
+    ):
+        temp_path.unlink(missing_ok=True)
+        app.exit(f"Bad file size or checksum in bundle: {file_name}")
+    os.replace(temp_path, target)
+    # Records the digests so verifying it again later doesn't re-read it
+    network.FileProps(target, hasher=hasher)
+    logging.info(f"Imported {file_name} into {target.parent}")
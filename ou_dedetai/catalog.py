@@ -0,0 +1,106 @@
+"""Releases of a Faithlife product, parsed once and indexed by version.
+
+Versions are kept both as the feed lists them (e.g. "40.1.0.0034", as used in
+download URLs) and as tuples of ints, so comparing them needs no string parsing.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Optional
+
+VersionKey = tuple[int, ...]
+
+
+@lru_cache(maxsize=256)
+def parse_version(version: str) -> VersionKey:
+    """Parses a product version like "40.1.0.0034" into comparable ints
+
+    Raises:
+        ValueError - if a part of the version isn't a number
+    """
+    return tuple(int(part) for part in version.split('.'))
+
+
+def is_older_than(version: Optional[str], major: int) -> bool:
+    """Whether version's major part is below major. False if version is unknown"""
+    if version is None:
+        return False
+    return parse_version(version)[0] < major
+
+
+class ReleaseCatalog:
+    """The releases listed in a product's update feed, newest first"""
+    def __init__(self, releases: list[tuple[VersionKey, str]]) -> None:
+        self._releases = sorted(releases, reverse=True)
+        self._by_major: dict[int, list[str]] = {}
+        self._by_minor: dict[tuple[int, ...], list[str]] = {}
+        for key, version in self._releases:
+            self._by_major.setdefault(key[0], []).append(version)
+            if len(key) > 1:
+                self._by_minor.setdefault(key[:2], []).append(version)
+
+    @classmethod
+    def from_versions(cls, versions: list[str]) -> "ReleaseCatalog":
+        releases: list[tuple[VersionKey, str]] = []
+        for version in versions:
+            try:
+                releases.append((parse_version(version), version))
+            except ValueError:
+                logging.warning(f"Ignoring release with unknown version: {version}")
+        return cls(releases)
+
+    def __len__(self) -> int:
+        return len(self._releases)
+
+    def versions(self) -> list[str]:
+        """All releases, newest first"""
+        return [version for _, version in self._releases]
+
+    def latest(
+        self,
+        major: Optional[int] = None,
+        minor: Optional[int] = None
+    ) -> Optional[str]:
+        """The newest release, optionally within major or major.minor"""
+        matches = self.releases(major, minor)
+        return matches[0] if matches else None
+
+    def releases(
+        self,
+        major: Optional[int] = None,
+        minor: Optional[int] = None
+    ) -> list[str]:
+        """Releases within major or major.minor (all if neither), newest first"""
+        if major is None:
+            return self.versions()
+        if minor is None:
+            return list(self._by_major.get(major, []))
+        return list(self._by_minor.get((major, minor), []))
+
+    def below(self, major: int) -> list[str]:
+        """Releases with a major version below major, newest first"""
+        return [
+            version
+            for older_major, versions in self._by_major.items()
+            if older_major < major
+            for version in versions
+        ]
+
+    def newer_than(self, version: Optional[str]) -> list[str]:
+        """Releases newer than version, newest first. All of them if version is
+        unknown"""
+        if version is None:
+            return self.versions()
+        key = parse_version(version)
+        return [v for k, v in self._releases if k > key]
+
+    def to_dict(self) -> dict:
+        """Returns what's saved in the network cache, see from_dict"""
+        return {
+            "releases": [[version, list(key)] for key, version in self._releases]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReleaseCatalog":
+        # Versions were already parsed when saved
+        return cls([(tuple(key), version) for version, key in data["releases"]])
@@ -9,8 +9,13 @@ from ou_dedetai.config import EphemeralConfiguration
 from ou_dedetai.system import SuperuserCommandNotFound
 from ou_dedetai.logos import State as LogosRunningState
 
+from . import bundle
 from . import control
 from . import installer
+from . import peers
+from . import staging
+from . import store
+from . import telemetry
 from . import wine
 from . import utils
 
@@ -28,12 +33,51 @@ class CLI(App):
     def backup(self):
         control.backup(app=self)
 
+    def cache_gc(self):
+        evicted = store.collect_garbage(self)
+        freed = sum(entry["size"] for entry in evicted)
+        self.status(f"Evicted {len(evicted)} files, freeing {utils.format_bytes(freed)}.")  # noqa: E501
+
+    def cache_stats(self):
+        stats = store.cache_stats(self)
+        for entry in stats["entries"]:
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))  # noqa: E501
+            paths = ", ".join(entry["paths"]) or entry["sha256"]
+            print(f"{last_used}  {utils.format_bytes(entry['size']):>10}  {paths}")
+        self.status(
+            f"{stats['artifacts']} files ({stats['pinned']} in use), "
+            f"{utils.format_bytes(stats['size'])} of "
+            f"{utils.format_bytes(stats['budget'])}."
+        )
+
     def create_shortcuts(self):
         installer.create_launcher_shortcuts(self)
 
+    def download_stats(self):
+        stats = telemetry.host_stats()
+        for host in stats:
+            rate = host["rate"]
+            recent_rate = host["recent_rate"]
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(host["last_used"]))  # noqa: E501
+            print(
+                f"{host['host']}: {host['downloads']} downloads "
+                f"({host['failures']} failed), "
+                f"{utils.format_bytes(host['bytes'])}, "
+                f"{utils.format_bytes(round(rate)) if rate else '?'}/s overall, "
+                f"{utils.format_bytes(round(recent_rate)) if recent_rate else '?'}/s recently, "  # noqa: E501
+                f"last used {last_used}"
+            )
+        self.status(f"Download history of {len(stats)} hosts.")
+
     def edit_config(self):
         control.edit_file(self.conf.config_file_path)
 
+    def export_bundle(self):
+        bundle.export_bundle(self, self.conf._overrides.bundle_path or "")
+
+    def import_bundle(self):
+        bundle.import_bundle(self, self.conf._overrides.bundle_path or "")
+
     def install_app(self):
         installer.install(self)
         self.exit("Install has finished", intended=True)
@@ -60,12 +104,16 @@ class CLI(App):
         self.logos.index()
 
     def run_installed_app(self):
+        staging.apply_staged_update(self)
         self.logos.start()
         # Keep the process running so that our background threads can keep running
         while self.logos.logos_state != LogosRunningState.STOPPED:
             time.sleep(3)
             self.logos.monitor()
 
+    def serve_cache(self):
+        peers.serve(self)
+
     def stop_installed_app(self):
         self.logos.stop()
 
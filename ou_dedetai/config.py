@@ -6,7 +6,8 @@ import json
 import logging
 from pathlib import Path
 
-from ou_dedetai import network, utils, constants, wine
+from ou_dedetai import network, peers, utils, constants, wine, winepath
+from ou_dedetai.catalog import ReleaseCatalog
 
 from ou_dedetai.constants import PROMPT_OPTION_DIRECTORY
 
@@ -241,6 +242,8 @@ class EphemeralConfiguration:
     # Start of values just set via cli arg
     faithlife_install_passive: bool = False
     app_run_as_root_permitted: bool = False
+    bundle_path: Optional[str] = None
+    """Path of the offline bundle to export or import"""
 
     @classmethod
     def from_legacy(cls, legacy: LegacyConfiguration) -> "EphemeralConfiguration":
@@ -331,6 +334,14 @@ class PersistentConfiguration:
     faithlife_product_release_channel: str = "stable"
     # The Installer's release channel. Either "stable" or "beta"
     app_release_channel: str = "stable"
+    # Base URLs of other machines serving their download cache (--serve-cache)
+    peer_cache_urls: Optional[list[str]] = None
+    # Whether to look for machines serving their download cache on the LAN
+    peer_cache_discovery: Optional[bool] = None
+    # Size in bytes to keep the download cache within
+    download_cache_budget: Optional[int] = None
+    # Whether to download newer releases in the background, to install on next run
+    faithlife_product_update_staging: Optional[bool] = None
 
     _legacy: Optional[LegacyConfiguration] = None
     """A Copy of the legacy configuration.
@@ -505,6 +516,7 @@ class Config:
     _installed_faithlife_product_release: Optional[str] = None
     _wine_binary_files: Optional[list[str]] = None
     _wine_appimage_files: Optional[list[str]] = None
+    _peer_cache_urls: Optional[list[str]] = None
 
     # Start constants
     _curses_color_scheme_valid_values = ["System", "Light", "Dark", "Logos"]
@@ -522,6 +534,21 @@ class Config:
         self._overrides = ephemeral_config
 
         self._network = network.NetworkRequests(ephemeral_config.check_updates_now)
+        # Start looking up everything we're likely to need from the network at
+        # once, rather than one at a time as each value is first used.
+        faithlife_installer_download_url = None
+        if (
+            self._raw.faithlife_product is not None
+            and self._raw.faithlife_product_release is not None
+        ):
+            faithlife_installer_download_url = self.faithlife_installer_download_url
+        self._network.prefetch(
+            app_release_channel=self.app_release_channel,
+            faithlife_product=self._raw.faithlife_product,
+            faithlife_product_version=self.faithlife_product_version,
+            faithlife_product_release_channel=self.faithlife_product_release_channel,
+            faithlife_installer_download_url=faithlife_installer_download_url,
+        )
 
         logging.debug("Current persistent config:")
         for k, v in self._raw.__dict__.items():
@@ -638,13 +665,17 @@ class Config:
             self._write()
 
     @property
-    def faithlife_product_releases(self) -> list[str]:
-        return self._network.faithlife_product_releases(
+    def faithlife_product_catalog(self) -> ReleaseCatalog:
+        return self._network.faithlife_product_catalog(
             product=self.faithlife_product,
             version=self.faithlife_product_version,
             channel=self.faithlife_product_release_channel
         )
 
+    @property
+    def faithlife_product_releases(self) -> list[str]:
+        return self.faithlife_product_catalog.versions()
+
     @property
     def faithlife_product_release(self) -> str:
         question = f"Which version of {self.faithlife_product} {self.faithlife_product_version} do you want to install?: "  # noqa: E501
@@ -680,14 +711,22 @@ class Config:
     def faithlife_installer_name(self) -> str:
         if self._overrides.faithlife_installer_name is not None:
             return self._overrides.faithlife_installer_name
-        return f"{self.faithlife_product}_v{self.faithlife_product_release}-x64.msi"
+        return self.faithlife_installer_name_for(self.faithlife_product_release)
+
+    def faithlife_installer_name_for(self, release: str) -> str:
+        """Installer file name of a release other than the one selected"""
+        return f"{self.faithlife_product}_v{release}-x64.msi"
 
     @property
     def faithlife_installer_download_url(self) -> str:
         if self._overrides.faithlife_installer_download_url is not None:
             return self._overrides.faithlife_installer_download_url
+        return self.faithlife_installer_download_url_for(self.faithlife_product_release)  # noqa: E501
+
+    def faithlife_installer_download_url_for(self, release: str) -> str:
+        """Installer download url of a release other than the one selected"""
         after_version_url_part = "/Verbum/" if self.faithlife_product == "Verbum" else "/" # noqa: E501
-        return f"https://downloads.logoscdn.com/LBS{self.faithlife_product_version}{after_version_url_part}Installer/{self.faithlife_product_release}/{self.faithlife_product}-x64.msi"  # noqa: E501
+        return f"https://downloads.logoscdn.com/LBS{self.faithlife_product_version}{after_version_url_part}Installer/{release}/{self.faithlife_product}-x64.msi"  # noqa: E501
 
     @property
     def faithlife_product_release_channel(self) -> str:
@@ -970,23 +1009,26 @@ class Config:
             self._wine_user = get_wine_user(self.wine_prefix)
         return self._wine_user
 
+    def _logos_system_exe(self, exe_name: str) -> Optional[str]:
+        """Windows path of an exe in Logos' System directory"""
+        if self.wine_user is None:
+            return None
+        return winepath.to_windows(
+            self.wine_prefix,
+            f"{self.wine_prefix}/drive_c/users/{self.wine_user}/AppData/Local/Logos/System/{exe_name}"  # noqa: E501
+        )
+
     @property
     def logos_cef_exe(self) -> Optional[str]:
-        if self.wine_user is not None:
-            return f'C:\\users\\{self.wine_user}\\AppData\\Local\\Logos\\System\\LogosCEF.exe'  # noqa: E501
-        return None
+        return self._logos_system_exe("LogosCEF.exe")
 
     @property
     def logos_indexer_exe(self) -> Optional[str]:
-        if self.wine_user is not None:
-            return f'C:\\users\\{self.wine_user}\\AppData\\Local\\Logos\\System\\LogosIndexer.exe'  # noqa: E501
-        return None
+        return self._logos_system_exe("LogosIndexer.exe")
 
     @property
     def logos_login_exe(self) -> Optional[str]:
-        if self.wine_user is not None:
-            return f'C:\\users\\{self.wine_user}\\AppData\\Local\\Logos\\System\\Logos.exe'  # noqa: E501
-        return None
+        return self._logos_system_exe("Logos.exe")
 
     @property
     def log_level(self) -> str | int:
@@ -1037,3 +1079,38 @@ class Config:
     @property
     def icu_latest_version_url(self) -> str:
         return self._network.icu_latest_version().download_url
+
+    @property
+    def peer_cache_urls(self) -> list[str]:
+        """Download caches served by other machines, tried before upstream servers
+
+        Both the ones configured and, if enabled, those found on the LAN."""
+        if self._peer_cache_urls is None:
+            self._peer_cache_urls = list(self._raw.peer_cache_urls or [])
+            if self._raw.peer_cache_discovery:
+                for url in peers.discover():
+                    if url not in self._peer_cache_urls:
+                        self._peer_cache_urls.append(url)
+        return self._peer_cache_urls
+
+    @property
+    def faithlife_product_update_staging(self) -> bool:
+        """Whether newer releases are downloaded in the background while the app
+        runs, see staging.py"""
+        if self._raw.faithlife_product_update_staging is not None:
+            return self._raw.faithlife_product_update_staging
+        return False
+
+    @property
+    def download_cache_budget(self) -> int:
+        """Size in bytes the download cache is kept within"""
+        if self._raw.download_cache_budget is not None:
+            return self._raw.download_cache_budget
+        return constants.DOWNLOAD_CACHE_BUDGET
+
+    @property
+    def icu_latest_version_file_name(self) -> str:
+        """File name the latest ICU release is downloaded as"""
+        icu_filename = os.path.basename(self.icu_latest_version_url).removesuffix(".tar.gz")  # noqa: E501
+        # Append the version so it doesn't collide with previous versions
+        return f"{icu_filename}-{self.icu_latest_version}.tar.gz"
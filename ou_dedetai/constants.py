@@ -49,6 +49,62 @@ MATRIX_LINK = "https://matrix.to/#/#logosbible:matrix.org"
 
 CACHE_LIFETIME_HOURS = 12
 """How long to wait before considering our version cache invalid"""
+NETWORK_CACHE_WRITE_DELAY = 1.0
+"""Seconds to wait for further changes before writing the network cache to disk"""
+
+DOWNLOAD_SEGMENT_COUNT = 4
+"""Number of parallel connections to use when the server supports byte ranges"""
+DOWNLOAD_SEGMENT_MIN_SIZE = 8 * 1024 * 1024
+"""Files smaller than this (in bytes) are downloaded over a single connection"""
+DOWNLOAD_JOURNAL_CHUNK_SIZE = 4 * 1024 * 1024
+"""Size (in bytes) of the chunks a download's journal records a hash for"""
+DOWNLOAD_PROGRESS_INTERVAL = 0.5
+"""Seconds between download progress events"""
+DOWNLOAD_RATE_WINDOW = 5.0
+"""Seconds of a download the recent throughput (and so the ETA) is measured over"""
+DOWNLOAD_HISTORY_LENGTH = 100
+"""Number of downloads kept in each host's throughput history"""
+DOWNLOAD_HISTORY_RECENT = 10
+"""Number of a host's latest downloads its recent throughput is measured over"""
+
+DELTA_BLOCK_SIZE = 4096
+"""Size (in bytes) of the blocks delta downloads reuse from the previous file"""
+DELTA_MAX_FETCH_RATIO = 0.8
+"""Delta downloads that would fetch more than this share of the file download it
+whole instead"""
+DELTA_SCAN_TIME_LIMIT = 10.0
+"""Seconds to spend looking for reusable blocks in the previous file before
+downloading the new one whole instead"""
+
+NETWORK_POOL_CONNECTIONS = 10
+"""Number of hosts to keep a pool of open connections for"""
+NETWORK_POOL_MAXSIZE = 2 * DOWNLOAD_SEGMENT_COUNT
+"""Maximum number of idle connections kept open per host"""
+NETWORK_RETRIES = 3
+"""How many times to retry a request on connection errors and 5xx responses"""
+NETWORK_RETRY_BACKOFF = 0.5
+"""Backoff factor in seconds between retries, doubled on each attempt"""
+GITHUB_RATE_LIMIT_MAX_WAIT = 30.0
+"""Longest (in seconds) to wait for the GitHub API rate limit to reset, rather than
+giving up (or using cached data)"""
+GITHUB_TOKEN_ENV = "GITHUB_TOKEN"
+"""Environment variable with an optional GitHub token, for a higher rate limit"""
+NETWORK_PREFETCH_WORKERS = 4
+"""Maximum number of metadata lookups to run at once when prefetching"""
+
+DOWNLOAD_CACHE_BUDGET = 2 * 1024 * 1024 * 1024
+"""Default size (in bytes) to keep the download cache within, see store.collect_garbage"""  # noqa: E501
+
+WINEPREFIX_TEMPLATE_KEEP = 2
+"""Number of wineprefix templates (one per wine build) to keep, most recently used
+first"""
+
+PEER_CACHE_PORT = 8736
+"""Port the download cache is served to peers on, over both TCP and UDP (discovery)"""
+PEER_CACHE_DISCOVERY_TIMEOUT = 1.0
+"""Seconds to wait for peer caches to answer a discovery broadcast"""
+PEER_CACHE_TIMEOUT = 5.0
+"""Seconds to wait on a peer cache before moving on to the next source"""
 
 if RUNMODE == 'snap':
     _snap_user_common = os.getenv('SNAP_USER_COMMON')
@@ -68,6 +124,11 @@ DEFAULT_CONFIG_PATH = os.path.expanduser(f"{CONFIG_DIR}/{BINARY_NAME}.json")
 DEFAULT_APP_WINE_LOG_PATH = os.path.expanduser(f"{STATE_DIR}/wine.log")
 DEFAULT_APP_LOG_PATH = os.path.expanduser(f"{STATE_DIR}/{BINARY_NAME}.log")
 NETWORK_CACHE_PATH = f"{CACHE_DIR}/network.json"
+FILE_HASH_CACHE_PATH = f"{CACHE_DIR}/file_hashes.json"
+ARTIFACT_STORE_DIR = f"{CACHE_DIR}/artifacts"
+STAGED_UPDATE_PATH = f"{CACHE_DIR}/staged_update.json"
+DOWNLOAD_HISTORY_PATH = f"{CACHE_DIR}/download_history.json"
+WINEPREFIX_TEMPLATE_DIR = f"{CACHE_DIR}/wineprefix-templates"
 DEFAULT_WINEDEBUG = "fixme+all,err+all"
 LEGACY_CONFIG_FILES = [
     # If the user didn't have XDG_CONFIG_HOME set before, but now does.
@@ -8,10 +8,12 @@ import queue
 import os
 import shutil
 import time
+from collections import Counter
 from pathlib import Path
 
 from ou_dedetai.app import App
 
+from . import placement
 from . import system
 from . import utils
 
@@ -148,8 +150,10 @@ def backup_and_restore(mode: str, app: App):
 
 
 def copy_data(src_dirs, dst_dir):
+    strategies: Counter[str] = Counter()
     for src in src_dirs:
-        shutil.copytree(src, Path(dst_dir) / src.name)
+        strategies += placement.copy_tree(src, Path(dst_dir) / src.name)
+    logging.info(f"Files copied by strategy: {dict(strategies)}")
 
 
 def remove_install_dir(app: App):
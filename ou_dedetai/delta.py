@@ -0,0 +1,278 @@
+"""Block-level delta downloads, in the style of zsync.
+
+A release publishes a block map next to a file: its size and sha256, and for every
+fixed size block a weak rolling checksum and an md5. To update, the file already
+on disk is scanned with the rolling checksum, so blocks are found even where data
+has shifted. Blocks found are copied from it, and only the rest are fetched with
+range requests. The result is checked against the sha256 before it's used.
+
+Block maps are made with:
+    python -m ou_dedetai.delta FILE
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+from . import constants
+from . import network
+
+BLOCK_MAP_SUFFIX = ".blockmap"
+BLOCK_MAP_FORMAT = 1
+"""Version of the block map layout, bumped on incompatible changes"""
+_RECORD = struct.Struct(">I16s")
+"""Each block's weak checksum and md5"""
+_MERGE_GAP = 16
+"""Missing blocks at most this many blocks apart are fetched in one request"""
+
+
+def _weak_checksum(data: bytes) -> tuple[int, int]:
+    """rsync's rolling checksum of a block, as its two 16-bit halves"""
+    a = sum(data) & 0xffff
+    b = sum((len(data) - i) * x for i, x in enumerate(data)) & 0xffff
+    return a, b
+
+
+class BlockMap:
+    """Checksums of each block of a file, see the module docstring"""
+    def __init__(
+        self,
+        length: int,
+        sha256: str,
+        block_size: int,
+        blocks: list[tuple[int, bytes]]
+    ) -> None:
+        self.length = length
+        self.sha256 = sha256
+        self.block_size = block_size
+        self.blocks = blocks
+
+    @classmethod
+    def from_file(
+        cls,
+        file_path: Path,
+        block_size: int = constants.DELTA_BLOCK_SIZE
+    ) -> "BlockMap":
+        blocks = []
+        sha256 = hashlib.sha256()
+        with file_path.open("rb") as f:
+            while block := f.read(block_size):
+                sha256.update(block)
+                # The last block is padded, so every block is the same size
+                block = block.ljust(block_size, b"\0")
+                a, b = _weak_checksum(block)
+                blocks.append((a | b << 16, hashlib.md5(block).digest()))
+        return cls(file_path.stat().st_size, sha256.hexdigest(), block_size, blocks)
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            "format": BLOCK_MAP_FORMAT,
+            "length": self.length,
+            "sha256": self.sha256,
+            "block_size": self.block_size,
+        })
+        records = b"".join(_RECORD.pack(weak, md5) for weak, md5 in self.blocks)
+        return header.encode() + b"\n" + records
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BlockMap":
+        """Raises:
+            ValueError - if data isn't a block map this version understands
+        """
+        header_bytes, _, records = data.partition(b"\n")
+        try:
+            header = json.loads(header_bytes)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid block map header: {e}") from e
+        if header.get("format") != BLOCK_MAP_FORMAT:
+            raise ValueError(f"Unsupported block map format: {header.get('format')}")
+        block_size: int = header["block_size"]
+        length: int = header["length"]
+        count = (length + block_size - 1) // block_size
+        if len(records) != count * _RECORD.size:
+            raise ValueError("Block map is truncated")
+        blocks = [
+            (weak, md5) for weak, md5 in _RECORD.iter_unpack(records)
+        ]
+        return cls(length, header["sha256"], block_size, blocks)
+
+
+def find_blocks(
+    block_map: BlockMap,
+    seed_path: Path,
+    time_limit: float = constants.DELTA_SCAN_TIME_LIMIT
+) -> Optional[dict[int, int]]:
+    """Scans seed_path for blocks of the block map, wherever they are
+
+    The scan rolls through the seed a byte at a time in Python, which is slow where
+    little of it matches. It's given up after time_limit seconds.
+
+    Returns:
+        dict - offset in seed_path of each block found, by block index. None if
+            the scan took too long
+    """
+    size = block_map.block_size
+    by_weak: dict[int, list[int]] = {}
+    for index, (weak, _) in enumerate(block_map.blocks):
+        by_weak.setdefault(weak, []).append(index)
+    found: dict[int, int] = {}
+
+    data = seed_path.read_bytes()
+    # Pad like the last block of the block map
+    data += b"\0" * size
+    end = len(data) - size
+    offset = 0
+    steps = 0
+    deadline = time.monotonic() + time_limit
+    a, b = _weak_checksum(data[0:size])
+    while offset <= end and len(found) < len(block_map.blocks):
+        steps += 1
+        # Checking the time every step would slow the scan down further
+        if steps & 0xffff == 0 and time.monotonic() > deadline:
+            logging.info(f"Gave up scanning {seed_path} after {time_limit}s")
+            return None
+        matched = False
+        indexes = by_weak.get(a | b << 16)
+        if indexes is not None:
+            md5 = hashlib.md5(data[offset:offset + size]).digest()
+            for index in indexes:
+                if block_map.blocks[index][1] == md5:
+                    found.setdefault(index, offset)
+                    matched = True
+        if matched:
+            # Blocks don't overlap, so resume scanning after this one
+            offset += size
+            if offset <= end:
+                a, b = _weak_checksum(data[offset:offset + size])
+            continue
+        if offset == end:
+            break
+        # Roll the window one byte forward
+        old, new = data[offset], data[offset + size]
+        a = (a - old + new) & 0xffff
+        b = (b - size * old + a) & 0xffff
+        offset += 1
+    return found
+
+
+def _missing_ranges(block_map: BlockMap, found: dict[int, int]) -> list[tuple[int, int]]:  # noqa: E501
+    """Returns the inclusive byte ranges of the blocks not found, merging those
+    close together so fewer requests are needed"""
+    ranges: list[tuple[int, int]] = []
+    size = block_map.block_size
+    for index in range(len(block_map.blocks)):
+        if index in found:
+            continue
+        start = index * size
+        end = min(start + size, block_map.length) - 1
+        if ranges and start - ranges[-1][1] <= _MERGE_GAP * size:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _fetch_range(url: str, start: int, end: int) -> bytes:
+    with network.get_session().get(
+        url,
+        headers={'Range': f"bytes={start}-{end}", 'Accept-Encoding': 'identity'},
+    ) as r:
+        r.raise_for_status()
+        if r.status_code != 206 or len(r.content) != end - start + 1:
+            raise requests.exceptions.RequestException(
+                f"Server didn't return the range {start}-{end}"
+            )
+        return r.content
+
+
+def download(url: str, seed_path: Path, target: Path) -> bool:
+    """Downloads url into target, reusing the blocks it shares with seed_path
+
+    Needs the block map published at url + BLOCK_MAP_SUFFIX. The result is
+    written to a temporary file, synced to disk and renamed into place.
+
+    Returns:
+        bool - whether target now holds the verified file. If not, the caller
+            should download the whole file instead
+    """
+    try:
+        with network.get_session().get(url + BLOCK_MAP_SUFFIX) as r:
+            r.raise_for_status()
+            block_map = BlockMap.from_bytes(r.content)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logging.info(f"No usable block map for {url}: {e}")
+        return False
+
+    try:
+        found = find_blocks(block_map, seed_path)
+    except OSError as e:
+        logging.info(f"Failed to read {seed_path} for a delta download: {e}")
+        return False
+    if found is None:
+        return False
+    ranges = _missing_ranges(block_map, found)
+    fetch_size = sum(end - start + 1 for start, end in ranges)
+    logging.info(
+        f"Delta download of {url}: {len(found)}/{len(block_map.blocks)} blocks "
+        f"found locally, fetching {fetch_size} of {block_map.length} bytes "
+        f"in {len(ranges)} requests"
+    )
+    if fetch_size >= block_map.length * constants.DELTA_MAX_FETCH_RATIO:
+        logging.info("Too little of the file can be reused, downloading all of it")
+        return False
+
+    size = block_map.block_size
+    temp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    sha256 = hashlib.sha256()
+    try:
+        target.parent.mkdir(exist_ok=True, parents=True)
+        with seed_path.open("rb") as seed, temp_path.open("wb") as f:
+            remote = iter(ranges)
+            next_range = next(remote, None)
+            position = 0
+            while position < block_map.length:
+                index = position // size
+                if index in found:
+                    seed.seek(found[index])
+                    length = min(size, block_map.length - position)
+                    # Short if it matched the padding after the end of the seed
+                    data = seed.read(length).ljust(length, b"\0")
+                elif next_range is not None and next_range[0] == position:
+                    data = _fetch_range(url, *next_range)
+                    next_range = next(remote, None)
+                else:
+                    raise ValueError(f"No source for block {index}")
+                f.write(data)
+                sha256.update(data)
+                position += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if sha256.hexdigest() != block_map.sha256:
+            raise ValueError("Reassembled file has the wrong checksum")
+        os.replace(temp_path, target)
+    except (requests.exceptions.RequestException, OSError, ValueError) as e:
+        logging.warning(f"Delta download of {url} failed: {e}")
+        temp_path.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def main():
+    """Writes the block map of each file given next to it"""
+    for file_name in sys.argv[1:]:
+        file_path = Path(file_name)
+        block_map_path = file_path.with_name(file_path.name + BLOCK_MAP_SUFFIX)
+        block_map_path.write_bytes(BlockMap.from_file(file_path).to_bytes())
+        print(f"Wrote {block_map_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,21 @@ import os
 import shutil
 import sys
 from pathlib import Path
+from typing import Optional
 
 from ou_dedetai.app import App
 
 from . import constants
 from . import network
+from . import placement
+from . import prefix_template
+from . import store
 from . import utils
 from . import wine
 
+WINEPREFIX_CLONED = "cloned"
+WINEPREFIX_INITIALIZED = "initialized"
+
 
 # This step doesn't do anything per-say, but "collects" all the choices in one step
 # The app would continue to work without this function
@@ -131,49 +138,73 @@ def ensure_product_installer_download(app: App):
     # Copy file into install dir.
     installer = Path(f"{app.conf.install_dir}/data/{app.conf.faithlife_installer_name}")
     if not installer.is_file():
-        shutil.copy(downloaded_file, installer.parent)
+        store.artifact_store.place_file(downloaded_file, installer)
 
     logging.debug(f"> '{downloaded_file}' exists?: {Path(downloaded_file).is_file()}")  # noqa: E501
 
 
 
-def ensure_wineprefix_init(app: App):
+def ensure_wineprefix_init(app: App) -> Optional[str]:
+    """Returns:
+        str - how the prefix was created, WINEPREFIX_CLONED or
+            WINEPREFIX_INITIALIZED, or None if it already existed
+    """
     app.installer_step_count += 1
     ensure_product_installer_download(app=app)
     app.installer_step += 1
     app.status("Ensuring wineprefix is initialized…")
 
+    created = None
     init_file = Path(f"{app.conf.wine_prefix}/system.reg")
     logging.debug(f"{init_file=}")
     if not init_file.is_file():
         logging.debug(f"{init_file} does not exist")
-        logging.debug("Initializing wineprefix.")
-        process = wine.initializeWineBottle(app.conf.wine64_binary, app)
-        if process:
-            process.wait()
-        # wine.light_wineserver_wait()
-        wine.wineserver_wait(app)
+        if prefix_template.clone(app):
+            created = WINEPREFIX_CLONED
+        else:
+            logging.debug("Initializing wineprefix.")
+            process = wine.initializeWineBottle(app.conf.wine64_binary, app)
+            if process:
+                process.wait()
+            # wine.light_wineserver_wait()
+            wine.wineserver_wait(app)
+            created = WINEPREFIX_INITIALIZED
         logging.debug("Wine init complete.")
     logging.debug(f"> {init_file} exists?: {init_file.is_file()}")
+    return created
 
 
 def ensure_wineprefix_config(app: App):
     app.installer_step_count += 1
-    ensure_wineprefix_init(app=app)
+    created = ensure_wineprefix_init(app=app)
     app.installer_step += 1
     app.status("Ensuring wineprefix configuration…")
 
+    if created == WINEPREFIX_CLONED:
+        logging.debug("Wineprefix template is already configured.")
+        return
+
+    # Collected and imported all at once
+    changeset = wine.RegistryChangeset()
+    wine64_binary = app.conf.wine64_binary
+
     # Force winemenubuilder.exe='' in registry.
     logging.debug("Setting wineprefix registry to ignore winemenubuilder.exe.")
-    wine.disable_winemenubuilder(app=app, wine64_binary=app.conf.wine64_binary)
+    wine.disable_winemenubuilder(app, wine64_binary, changeset=changeset)
 
     # Force renderer=gdi in registry.
     logging.debug("Setting renderer=gdi in wineprefix registry.")
-    wine.set_renderer(app=app, wine64_binary=app.conf.wine64_binary, value='gdi')
+    wine.set_renderer(app, wine64_binary, value='gdi', changeset=changeset)
 
     # Force fontsmooth=rgb in registry.
     logging.debug("Setting fontsmoothing=rgb in wineprefix registry.")
-    wine.set_fontsmoothing_to_rgb(app=app, wine64_binary=app.conf.wine64_binary)
+    wine.set_fontsmoothing_to_rgb(app, wine64_binary, changeset=changeset)
+
+    changeset.apply(app, wine64_binary)
+
+    if created == WINEPREFIX_INITIALIZED:
+        # Nothing else is in the prefix yet, so later installs can start from it
+        prefix_template.capture(app)
 
 
 def ensure_icu_data_files(app: App):
@@ -232,7 +263,7 @@ def ensure_launcher_executable(app: App):
             logging.debug("Removing existing launcher binary.")
             launcher_exe.unlink()
         logging.info(f"Creating launcher binary by copying this installer binary to {launcher_exe}.")  # noqa: E501
-        shutil.copy(sys.executable, launcher_exe)
+        placement.place_file(sys.executable, launcher_exe)
         logging.debug(f"> File exists?: {launcher_exe}: {launcher_exe.is_file()}")  # noqa: E501
     else:
         app.status(
@@ -258,6 +289,7 @@ def install(app: App):
     """Entrypoint for installing"""
     app.status('Installing…')
     ensure_launcher_shortcuts(app)
+    logging.info(f"Wine usage during install: {wine.stats}")
     app.status("Install Complete!", 100)
     # Trigger a config update event to refresh the UIs
     app._config_updated_event.set()
@@ -292,7 +324,12 @@ def create_wine_appimage_symlinks(app: App):
         return
     if not appimage_file.exists():
         app.status(f"Copying: {downloaded_file} into: {appdir_bindir}")
-        shutil.copy(downloaded_file, appdir_bindir)
+        # Not hardlinked, as the mode set below would apply to the stored copy too
+        store.artifact_store.place_file(
+            downloaded_file,
+            appimage_file,
+            hardlink=False
+        )
     os.chmod(appimage_file, 0o755)
     app.conf.wine_appimage_path = appimage_file
     app.conf.wine_binary = str(appimage_file)
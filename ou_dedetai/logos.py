@@ -10,6 +10,7 @@ import threading
 
 from ou_dedetai.app import App
 
+from . import staging
 from . import system
 from . import utils
 from . import wine
@@ -134,6 +135,8 @@ class LogosManager:
             # Don't send "Running" message to GUI b/c it never clears.
             logging.info(f"Running {self.app.conf.faithlife_product}…")
             self.app.start_thread(run_logos, daemon_bool=False)
+            if self.app.conf.faithlife_product_update_staging:
+                self.app.start_thread(staging.stage_update, self.app)
             # NOTE: The following code would keep the CLI open while running
             # Logos, but since wine logging is sent directly to wine.log,
             # there's no terminal output to see. A user can see that output by:
@@ -366,13 +369,6 @@ class LogosManager:
             'add', 'HKCU\\Software\\Logos4\\Logging', '/v', 'Enabled',
             '/t', 'REG_DWORD', '/d', value, '/f'
         ]
-        process = wine.run_wine_proc(
-            self.app.conf.wine_binary,
-            app=self.app,
-            exe='reg',
-            exe_args=exe_args
-        )
-        if process:
-            process.wait()
+        wine.run_wine_command(self.app, 'reg', exe_args)
         wine.wineserver_wait(self.app)
         self.app.conf.faithlife_product_logging = state == state_enabled
@@ -148,10 +148,34 @@ def get_parser():
         '--update-latest-appimage', '-U', action='store_true',
         help='Update the to the latest AppImage.',
     )
+    cmd.add_argument(
+        '--cache-stats', action='store_true',
+        help='Show what is in the download cache.',
+    )
+    cmd.add_argument(
+        '--cache-gc', action='store_true',
+        help='Evict least recently used downloads until the cache is within its budget.',  # noqa: E501
+    )
+    cmd.add_argument(
+        '--download-stats', action='store_true',
+        help='Show the download throughput of each host, slowest first.',
+    )
+    cmd.add_argument(
+        '--serve-cache', action='store_true',
+        help='Serve downloaded files to other installs on the local network.',
+    )
     cmd.add_argument(
         '--set-appimage', nargs=1, metavar=('APPIMAGE_FILE_PATH'),
         help='Update the AppImage symlink. Requires a path.',
     )
+    cmd.add_argument(
+        '--export-bundle', nargs=1, metavar=('BUNDLE_FILE_PATH'),
+        help='Download everything the install needs into a bundle for offline installs.',  # noqa: E501
+    )
+    cmd.add_argument(
+        '--import-bundle', nargs=1, metavar=('BUNDLE_FILE_PATH'),
+        help='Verify a bundle and use its files for an offline install.',
+    )
     cmd.add_argument(
         '--install-icu', action='store_true',
         help='Install ICU data files for Logos 30+',
@@ -249,8 +273,13 @@ def parse_args(args, parser) -> Tuple[EphemeralConfiguration, Callable[[Ephemera
     # Set action return function.
     actions = [
         'backup',
+        'cache_gc',
+        'cache_stats',
         'create_shortcuts',
+        'download_stats',
         'edit_config',
+        'export_bundle',
+        'import_bundle',
         'install_app',
         'install_dependencies',
         'install_icu',
@@ -260,6 +289,7 @@ def parse_args(args, parser) -> Tuple[EphemeralConfiguration, Callable[[Ephemera
         'restore',
         'run_indexing',
         'run_installed_app',
+        'serve_cache',
         'stop_installed_app',
         'set_appimage',
         'toggle_app_logging',
@@ -281,6 +311,8 @@ def parse_args(args, parser) -> Tuple[EphemeralConfiguration, Callable[[Ephemera
                     raise argparse.ArgumentTypeError(e)
             elif arg == 'wine':
                 ephemeral_config.wine_args = getattr(args, 'wine')
+            elif arg in ['export_bundle', 'import_bundle']:
+                ephemeral_config.bundle_path = getattr(args, arg)[0]
             run_action = cli_operation(arg)
             break
     if run_action is None:
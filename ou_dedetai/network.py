@@ -1,26 +1,265 @@
 import abc
+import atexit
+import collections
+import concurrent.futures
 from dataclasses import dataclass, field
+import errno
+import fcntl
 import hashlib
+import io
 import json
 import logging
 import os
+import random
+import shutil
+import threading
 import time
-from typing import Optional
+from typing import Callable, Hashable, Optional, TypeVar
 import requests
-import shutil
 import sys
-from base64 import b64encode
+from base64 import b64decode, b64encode
 from pathlib import Path
 from urllib.parse import urlparse
 from xml.etree import ElementTree as ET
 
 import requests.structures
+from requests.adapters import HTTPAdapter, Retry
 
 from ou_dedetai.app import App
+from ou_dedetai.catalog import ReleaseCatalog
 
 from . import constants
+from . import delta
+from . import placement
+from . import store
+from . import telemetry
 from . import utils
 
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Returns the session shared by all network requests.
+
+    Connections are kept alive and pooled per host so repeated requests to the same
+    host skip the TCP and TLS handshakes. The underlying connection pools are
+    thread-safe, so the session is shared across threads.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=constants.NETWORK_RETRIES,
+                backoff_factor=constants.NETWORK_RETRY_BACKOFF,
+                status_forcelist=[500, 502, 503, 504],
+                allowed_methods=["HEAD", "GET"],
+                # Hand the last response back so callers can inspect it
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=constants.NETWORK_POOL_CONNECTIONS,
+                pool_maxsize=constants.NETWORK_POOL_MAXSIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            atexit.register(
+                lambda: logging.debug(f"Network connections: {session_stats()}")
+            )
+        return _session
+
+
+def session_stats() -> dict[str, int]:
+    """Counts connections opened and reused by the shared session's live pools"""
+    opened = 0
+    requests_made = 0
+    if _session is not None:
+        adapter = _session.get_adapter("https://")
+        if isinstance(adapter, HTTPAdapter):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                opened += pool.num_connections
+                requests_made += pool.num_requests
+    return {
+        "connections_opened": opened,
+        "connections_reused": max(requests_made - opened, 0),
+        "requests": requests_made,
+    }
+
+
+class GitHubRateLimitExceeded(requests.exceptions.RequestException):
+    """The GitHub API's request budget is spent until reset (epoch seconds)"""
+    def __init__(self, reset: Optional[float]) -> None:
+        self.reset = reset
+        when = "later"
+        if reset is not None:
+            when = time.strftime("%H:%M", time.localtime(reset))
+        super().__init__(f"GitHub API rate limit exceeded, try again after {when}")
+
+
+def _github_headers(url: str) -> dict[str, str]:
+    """Authenticates GitHub API requests if a token is set, raising the rate limit
+    """
+    token = os.getenv(constants.GITHUB_TOKEN_ENV)
+    if token and urlparse(url).netloc == "api.github.com":
+        return {"Authorization": f"Bearer {token}"}
+    return {}
+
+
+class NotEnoughDiskSpace(OSError):
+    """A download doesn't fit on the disk it's going to"""
+
+
+def check_disk_space(target: Path, size: Optional[int]):
+    """Fails fast if a download of size bytes won't fit next to target
+
+    Space already taken by an earlier attempt (target or its .part file) counts
+    towards it, as it's reused. Unless the file is a hardlink (e.g. to a stored
+    artifact), as it's then replaced rather than written to, and its blocks aren't
+    freed.
+
+    Raises:
+        NotEnoughDiskSpace
+    """
+    if size is None:
+        return
+    needed = size
+    for existing in [target, target.with_name(f"{target.name}.part")]:
+        try:
+            st = existing.stat()
+        except FileNotFoundError:
+            continue
+        if st.st_nlink == 1:
+            needed -= st.st_blocks * 512
+    directory = target.parent
+    directory.mkdir(exist_ok=True, parents=True)
+    if not utils.enough_disk_space(directory, needed):
+        free = shutil.disk_usage(directory).free
+        raise NotEnoughDiskSpace(
+            errno.ENOSPC,
+            f"{target.name} needs {utils.format_bytes(needed)} but only "
+            f"{utils.format_bytes(free)} is free",
+            str(directory)
+        )
+
+
+def preallocate(fd: int, size: int):
+    """Reserves size bytes on disk for the file, so a full disk fails before the
+    download starts rather than part way, and the file is laid out contiguously.
+    The file is extended to size if it's smaller.
+
+    Raises:
+        NotEnoughDiskSpace
+    """
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError as e:
+        if e.errno == errno.ENOSPC:
+            raise NotEnoughDiskSpace(e.errno, "Not enough disk space for the download") from e  # noqa: E501
+        # Not supported by the filesystem, it'll be allocated as it's written
+        logging.debug(f"Failed to preallocate {size} bytes: {e}")
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+
+
+class DownloadProgress:
+    """Counts the bytes of a download as they arrive, from any thread, and reports
+    them as telemetry.DownloadEvents"""
+    def __init__(
+        self,
+        total_size: Optional[int],
+        done: int = 0,
+        url: str = "",
+        name: Optional[str] = None
+    ) -> None:
+        self.total_size = total_size
+        self.done = done
+        self.url = url
+        self.name = name
+        self.host = urlparse(url).hostname
+        """Updated to where the data actually comes from, after redirects"""
+        self.transferred = 0
+        self.retries = 0
+        self._started = time.monotonic()
+        self._samples: collections.deque[tuple[float, int]] = collections.deque()
+        """Times and transferred bytes over the last constants.DOWNLOAD_RATE_WINDOW
+        seconds"""
+        self._last_report: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, length: int):
+        with self._lock:
+            self.done += length
+            self.transferred += length
+
+    def set_source(self, response: requests.Response):
+        self.host = urlparse(response.url).hostname or self.host
+
+    def event(self, finished: bool = False) -> telemetry.DownloadEvent:
+        now = time.monotonic()
+        with self._lock:
+            done, transferred = self.done, self.transferred
+            self._samples.append((now, transferred))
+            while now - self._samples[0][0] > constants.DOWNLOAD_RATE_WINDOW:
+                self._samples.popleft()
+            sample_time, sample_transferred = self._samples[0]
+        elapsed = now - self._started
+        average_rate = transferred / elapsed if elapsed > 0 else None
+        if now - sample_time >= constants.DOWNLOAD_PROGRESS_INTERVAL:
+            rate: Optional[float] = (transferred - sample_transferred) / (now - sample_time)  # noqa: E501
+        else:
+            # Too early to tell
+            rate = average_rate
+        eta = None
+        if self.total_size and rate:
+            eta = max(0, self.total_size - done) / rate
+        return telemetry.DownloadEvent(
+            url=self.url,
+            host=self.host,
+            name=self.name,
+            done=done,
+            total_size=self.total_size,
+            transferred=transferred,
+            elapsed=elapsed,
+            rate=rate,
+            average_rate=average_rate,
+            eta=eta,
+            retries=self.retries,
+            finished=finished
+        )
+
+    def report(self, app: Optional[App]):
+        """Sends the progress to app, at most every
+        constants.DOWNLOAD_PROGRESS_INTERVAL seconds"""
+        now = time.monotonic()
+        if (
+            self._last_report is not None
+            and now - self._last_report < constants.DOWNLOAD_PROGRESS_INTERVAL
+        ):
+            return
+        self._last_report = now
+        event = self.event()
+        if app is not None:
+            app.download_progress(event)
+
+    def finish(self, app: Optional[App], ok: bool):
+        """Reports the download as finished and records it in the host's history"""
+        event = self.event(finished=True)
+        if app is not None and ok:
+            app.download_progress(event)
+        telemetry.record_download(event, ok)
+        if event.average_rate is not None:
+            logging.info(
+                f"Downloaded {event.transferred} bytes from {event.host} in "
+                f"{event.elapsed:.1f}s ({utils.format_bytes(round(event.average_rate))}/s, "  # noqa: E501
+                f"{event.retries} retries)"
+            )
+
+
 class Props(abc.ABC):
     def __init__(self) -> None:
         self._md5: Optional[str] = None
@@ -46,12 +285,397 @@ class Props(abc.ABC):
     def _get_md5(self) -> Optional[str]:
         """Calculate the md5 sum"""
 
+class FileHasher:
+    """Computes a file's digests from the data as it is written to disk.
+
+    Data may be written out of order (as segmented downloads do). Anything written
+    past the contiguous prefix hashed so far is read back from the file as soon as
+    the gap in front of it is filled, so every byte is hashed exactly once.
+    """
+    def __init__(self, sha256: bool = False) -> None:
+        self._md5 = hashlib.md5()
+        self._sha256 = hashlib.sha256() if sha256 else None
+        self.position = 0
+        """Number of bytes hashed so far"""
+        self._pending: dict[int, int] = {}
+        """Ranges written but not yet hashed, offset to length"""
+        self._lock = threading.Lock()
+
+    @property
+    def md5(self) -> str:
+        """Base64 encoded md5, the same format as the Content-MD5 header"""
+        return b64encode(self._md5.digest()).decode('utf-8')
+
+    @property
+    def sha256(self) -> Optional[str]:
+        """Hex encoded sha256, if requested"""
+        if self._sha256 is None:
+            return None
+        return self._sha256.hexdigest()
+
+    def update(self, data: bytes) -> None:
+        self._md5.update(data)
+        if self._sha256 is not None:
+            self._sha256.update(data)
+        self.position += len(data)
+
+    def update_from_file(self, fd: int, end: Optional[int] = None) -> None:
+        """Hashes the file from the current position up to end (or EOF)"""
+        while end is None or self.position < end:
+            length = 524288
+            if end is not None:
+                length = min(length, end - self.position)
+            data = os.pread(fd, length, self.position)
+            if not data:
+                break
+            self.update(data)
+
+    def update_at(self, fd: int, offset: int, data: bytes) -> None:
+        """Hashes data that was just written to fd at offset.
+
+        fd MUST be readable, it is used to catch up on data written out of order.
+        """
+        with self._lock:
+            if offset != self.position:
+                self._pending[offset] = len(data)
+                return
+            self.update(data)
+            self._drain_pending(fd)
+
+    def mark_written(self, fd: int, offset: int, length: int) -> None:
+        """Records that fd already holds length bytes at offset.
+
+        They are read back and hashed as soon as everything before them has been.
+        """
+        with self._lock:
+            if offset != self.position:
+                self._pending[offset] = length
+                return
+            self.update_from_file(fd, offset + length)
+            self._drain_pending(fd)
+
+    def _drain_pending(self, fd: int) -> None:
+        while self.position in self._pending:
+            length = self._pending.pop(self.position)
+            self.update_from_file(fd, self.position + length)
+
+
+class FileHashCache:
+    """Persistent index of file digests.
+
+    Entries are keyed by path and only trusted while the file's inode, size and
+    modification time are unchanged. This lets unchanged files be verified without
+    reading them again.
+
+    Changes are written to disk shortly after they're made, so files hashed close
+    together share one write.
+    """
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._entries: Optional[dict[str, dict]] = None
+        self._dirty: set[str] = set()
+        """Keys changed since the index was last written"""
+        self._lock = threading.Lock()
+        self._write_timer: Optional[threading.Timer] = None
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _stat_key(file_path: Path) -> Optional[list[int]]:
+        try:
+            st = file_path.stat()
+        except OSError:
+            return None
+        return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def _read(self) -> dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open("r") as f:
+                entries: dict[str, dict] = json.load(f)
+            # Forget about files that have since been removed
+            return {k: v for k, v in entries.items() if Path(k).exists()}
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Failed to read file hash cache, clearing: {e}")
+            return {}
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _save(self) -> None:
+        """Writes the index to disk. Must be called with _lock held
+
+        Other processes may have written the index since we loaded it, their
+        entries are merged in and only the entries changed here take precedence.
+        Writers are serialized with a lock file.
+        """
+        entries = self._load()
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            lock_path = self.path.with_name(f"{self.path.name}.lock")
+            with open(lock_path, "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                on_disk = self._read()
+                for key in self._dirty:
+                    if key in entries:
+                        on_disk[key] = entries[key]
+                with temp_path.open("w") as f:
+                    json.dump(on_disk, f, indent=4, sort_keys=True)
+                    f.write("\n")
+                os.replace(temp_path, self.path)
+            self._entries = on_disk
+            self._dirty = set()
+        except OSError as e:
+            logging.warning(f"Failed to write file hash cache: {e}")
+            temp_path.unlink(missing_ok=True)
+
+    def _save_soon(self) -> None:
+        """Schedules a write. Must be called with _lock held"""
+        if self._write_timer is None:
+            self._write_timer = threading.Timer(
+                constants.NETWORK_CACHE_WRITE_DELAY,
+                self.flush
+            )
+            self._write_timer.daemon = True
+            self._write_timer.start()
+
+    def flush(self) -> None:
+        """Writes any pending changes to disk now"""
+        with self._lock:
+            if self._write_timer is not None:
+                self._write_timer.cancel()
+                self._write_timer = None
+            if self._dirty:
+                self._save()
+
+    def get(self, file_path: Path, algorithm: str = "md5") -> Optional[str]:
+        """Returns the cached digest if the file hasn't changed since it was hashed"""
+        key = str(file_path.resolve())
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is not None and entry.get("stat") == self._stat_key(file_path):
+                digest: Optional[str] = entry.get(algorithm)
+                if digest is not None:
+                    self.hits += 1
+                    return digest
+            self.misses += 1
+            return None
+
+    def set(self, file_path: Path, **digests: Optional[str]) -> None:
+        """Records digests (keyed by algorithm) for the file as it is right now"""
+        stat_key = self._stat_key(file_path)
+        if stat_key is None:
+            return
+        key = str(file_path.resolve())
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None or entry.get("stat") != stat_key:
+                # The file changed, none of the old digests apply
+                entry = {"stat": stat_key}
+            for algorithm, digest in digests.items():
+                if digest is not None:
+                    entry[algorithm] = digest
+            entries[key] = entry
+            self._dirty.add(key)
+            self._save_soon()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._load()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+file_hash_cache = FileHashCache(constants.FILE_HASH_CACHE_PATH)
+"""Digests of files we've already hashed, shared by all FileProps"""
+
+
+class DownloadJournal:
+    """Sidecar record of the hash of each chunk of a download as it was written.
+
+    Lets an interrupted or corrupted download keep every chunk that is still
+    intact on disk and re-fetch only the rest with range requests. The journal is
+    only used for the same url, size and ETag it was recorded for.
+    """
+    def __init__(
+        self,
+        target: Path,
+        url: str,
+        size: int,
+        etag: Optional[str] = None
+    ) -> None:
+        self.path = target.with_name(f"{target.name}.journal")
+        self.url = url
+        self.size = size
+        self.etag = etag
+        self.chunk_size: int = constants.DOWNLOAD_JOURNAL_CHUNK_SIZE
+        self.chunks: dict[int, str] = {}
+        """Hex md5 of each chunk written, keyed by chunk index"""
+        self.reused = 0
+        """Number of bytes that were already on disk and didn't need fetching"""
+        self._hashers: dict[int, "hashlib._Hash"] = {}
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    @classmethod
+    def load(
+        cls,
+        target: Path,
+        url: str,
+        size: int,
+        etag: Optional[str] = None
+    ) -> "DownloadJournal":
+        """Loads the journal for target, ignoring one left by a different download"""
+        journal = cls(target, url, size, etag)
+        try:
+            with journal.path.open("r") as f:
+                data: dict = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return journal
+        if (
+            data.get("url") == url
+            and data.get("size") == size
+            and data.get("etag") == etag
+            and data.get("chunk_size") == journal.chunk_size
+        ):
+            journal.chunks = {int(k): v for k, v in data.get("chunks", {}).items()}
+        return journal
+
+    @property
+    def chunk_count(self) -> int:
+        return -(-self.size // self.chunk_size)  # ceiling division
+
+    def _chunk_range(self, index: int) -> tuple[int, int]:
+        """Returns the start and (exclusive) end offsets of a chunk"""
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size)
+
+    def record(self, offset: int, data: bytes) -> None:
+        """Hashes data just written at offset.
+
+        Each chunk's data must be recorded in order, starting at the chunk's start.
+        """
+        view = memoryview(data)
+        completed = False
+        with self._lock:
+            while len(view) > 0:
+                index = offset // self.chunk_size
+                start, end = self._chunk_range(index)
+                piece = view[:end - offset]
+                if offset == start:
+                    self._hashers[index] = hashlib.md5()
+                hasher = self._hashers.get(index)
+                if hasher is not None:
+                    hasher.update(piece)
+                    if offset + len(piece) == end:
+                        self.chunks[index] = hasher.hexdigest()
+                        del self._hashers[index]
+                        completed = True
+                offset += len(piece)
+                view = view[len(piece):]
+            if completed and time.monotonic() - self._last_save > 1:
+                self._save()
+
+    def check(self, fd: int, hasher: Optional[FileHasher] = None) -> list[int]:
+        """Re-hashes the journaled chunks in fd, forgetting any that changed.
+
+        Args:
+            hasher: is given every intact chunk, so the file's digests don't need
+                another read once the missing chunks are filled in
+
+        Returns:
+            list[int] - indexes of the chunks that still need to be fetched
+        """
+        missing = []
+        file_size = os.fstat(fd).st_size
+        for index in range(self.chunk_count):
+            start, end = self._chunk_range(index)
+            expected = self.chunks.get(index)
+            intact = False
+            if expected is not None and end <= file_size:
+                data = os.pread(fd, end - start, start)
+                intact = hashlib.md5(data).hexdigest() == expected
+            if not intact:
+                self.chunks.pop(index, None)
+                missing.append(index)
+                continue
+            if hasher is not None:
+                if hasher.position == start:
+                    hasher.update(data)
+                else:
+                    hasher.mark_written(fd, start, end - start)
+        self.reused = sum(
+            end - start
+            for start, end in map(self._chunk_range, self.chunks)
+        )
+        return missing
+
+    def ranges(self, indexes: list[int], count: int) -> list[tuple[int, int]]:
+        """Groups chunks into at most about count byte ranges (inclusive) to fetch"""
+        runs: list[list[int]] = []
+        for index in sorted(indexes):
+            if runs and runs[-1][1] == index:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1])
+        # Split the largest runs so there's enough to keep count connections busy
+        per_range = max(1, -(-len(indexes) // count))
+        output = []
+        for first, last in runs:
+            for index in range(first, last, per_range):
+                start = self._chunk_range(index)[0]
+                end = self._chunk_range(min(index + per_range, last) - 1)[1]
+                output.append((start, end - 1))
+        return output
+
+    def _save(self) -> None:
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with temp_path.open("w") as f:
+                json.dump({
+                    "url": self.url,
+                    "size": self.size,
+                    "etag": self.etag,
+                    "chunk_size": self.chunk_size,
+                    "chunks": self.chunks,
+                }, f)
+            os.replace(temp_path, self.path)
+            self._last_save = time.monotonic()
+        except OSError as e:
+            logging.warning(f"Failed to write download journal: {e}")
+            temp_path.unlink(missing_ok=True)
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
 class FileProps(Props):
-    def __init__(self, path: str | Path | None):
+    def __init__(self, path: str | Path | None, hasher: Optional[FileHasher] = None):
+        """
+        Args:
+            path: file to describe
+            hasher: digests already computed over the whole file (while it was
+                being written), avoids reading the file again
+        """
         super(FileProps, self).__init__()
         self.path = None
         if path is not None:
             self.path = Path(path)
+        if hasher is not None and self.path is not None:
+            self._md5 = hasher.md5
+            file_hash_cache.set(self.path, md5=hasher.md5, sha256=hasher.sha256)
 
     def _get_size(self):
         if self.path is None:
@@ -62,16 +686,36 @@ class FileProps(Props):
     def _get_md5(self) -> Optional[str]:
         if self.path is None:
             return None
-        md5 = hashlib.md5()
+        cached = file_hash_cache.get(self.path, "md5")
+        if cached is not None:
+            return cached
+        hasher = FileHasher()
         with self.path.open('rb') as f:
-            for chunk in iter(lambda: f.read(524288), b''):
-                md5.update(chunk)
-        return b64encode(md5.digest()).decode('utf-8')
+            hasher.update_from_file(f.fileno())
+        file_hash_cache.set(self.path, md5=hasher.md5)
+        return hasher.md5
+
+    @property
+    def sha256(self) -> Optional[str]:
+        """Hex encoded sha256 of the file"""
+        if self.path is None:
+            return None
+        cached = file_hash_cache.get(self.path, "sha256")
+        if cached is not None:
+            return cached
+        hasher = FileHasher(sha256=True)
+        with self.path.open('rb') as f:
+            hasher.update_from_file(f.fileno())
+        file_hash_cache.set(self.path, md5=hasher.md5, sha256=hasher.sha256)
+        return hasher.sha256
 
 @dataclass
 class SoftwareReleaseInfo:
     version: str
     download_url: str
+    download_size: Optional[int] = None
+    download_sha256: Optional[str] = None
+    """Hex digest, if the release publishes one"""
 
 
 class UrlProps(Props):
@@ -90,7 +734,7 @@ class UrlProps(Props):
         logging.debug(f"Getting headers from {self.path}.")
         try:
             h = {'Accept-Encoding': 'identity'}  # force non-compressed txfr
-            r = requests.head(self.path, allow_redirects=True, headers=h)
+            r = get_session().head(self.path, allow_redirects=True, headers=h)
         except requests.exceptions.ConnectionError:
             logging.critical("Failed to connect to the server.")
             raise
@@ -131,8 +775,8 @@ class CachedRequests:
     """This struct all network requests and saves to a cache"""
     # Some of these values are cached to avoid github api rate-limits
 
-    faithlife_product_releases: dict[str, dict[str, dict[str, list[str]]]] = field(default_factory=dict) # noqa: E501
-    """Cache of faithlife releases.
+    faithlife_product_catalogs: dict[str, dict[str, dict[str, dict]]] = field(default_factory=dict) # noqa: E501
+    """Cache of faithlife releases, see ReleaseCatalog.to_dict
     
     Since this depends on the user's selection we need to scope the cache based on that
     The cache key is the product, version, and release channel
@@ -151,36 +795,132 @@ class CachedRequests:
 
     url_size_and_hash: dict[str, tuple[Optional[int], Optional[str]]] = field(default_factory=dict) # noqa: E501
 
+    url_metadata: dict[str, dict[str, Optional[int | str]]] = field(default_factory=dict) # noqa: E501
+    """Size and digests of downloads as published alongside the release
+
+    Keyed by URL. Each entry has the size in bytes, and the hex sha256 if known.
+    Harvested from the GitHub release JSON and the product update feed, so most
+    downloads need no HEAD request. Kept when stale entries are cleaned out, as
+    it's refreshed along with the release data it came from.
+    """
+
+    http_validators: dict[str, dict[str, Optional[str | float]]] = field(default_factory=dict) # noqa: E501
+    """Validators for the responses the values above were parsed from
+
+    Keyed by URL. Each entry has the response's etag and last_modified (either may
+    be None) and expires, the time after which the entry must be revalidated with
+    the server before it's used again.
+    """
+
+    github_rate_limit: dict[str, Optional[float]] = field(default_factory=dict)
+    """The GitHub API's request budget, as of its last response
+
+    Has the requests remaining, when it resets and blocked_until (epoch seconds,
+    when the API asked us to wait), and observed, when it was recorded. Shared by
+    every process using the cache, so they don't spend it blindly.
+    """
+
     last_updated: Optional[float] = None
 
+    _dirty: set[tuple[str, ...]] = field(default_factory=set, repr=False, compare=False) # noqa: E501
+    """Paths of the entries changed since the cache was last written. Not saved"""
+
     @classmethod
     def load(cls) -> "CachedRequests":
         """Load the cache from file if exists"""
-        path = Path(constants.NETWORK_CACHE_PATH)
-        if path.exists():
-            with open(path, "r") as f:
-                try:
-                    output: dict = json.load(f)
-                    # Drop any unknown keys
-                    known_keys = CachedRequests().__dict__.keys()
-                    cache_keys = list(output.keys())
-                    for k in cache_keys:
-                        if k not in known_keys:
-                            del output[k]
-                    return CachedRequests(**output)
-                except json.JSONDecodeError:
-                    logging.warning("Failed to read cache JSON. Clearing…")
+        output = cls._read(Path(constants.NETWORK_CACHE_PATH))
+        if output is not None:
+            return output
         return CachedRequests(
             last_updated=time.time()
         )
 
+    @classmethod
+    def _read(cls, path: Path) -> Optional["CachedRequests"]:
+        if not path.exists():
+            return None
+        with open(path, "r") as f:
+            try:
+                return cls.from_dict(json.load(f))
+            except (json.JSONDecodeError, TypeError):
+                logging.warning("Failed to read cache JSON. Clearing…")
+        return None
+
+    @classmethod
+    def from_dict(cls, output: dict) -> "CachedRequests":
+        # Drop any unknown keys
+        known_keys = CachedRequests().__dict__.keys()
+        cache_keys = list(output.keys())
+        for k in cache_keys:
+            if k not in known_keys or k.startswith("_"):
+                del output[k]
+        return CachedRequests(**output)
+
+    def to_dict(self) -> dict:
+        """Returns the values that are saved to disk"""
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def _set(self, *path: str, value) -> None:
+        """Sets the entry at path, creating any parents, and marks it to be written.
+
+        The first element of path is the field name, the rest are dictionary keys.
+        """
+        if len(path) == 1:
+            setattr(self, path[0], value)
+        else:
+            node = getattr(self, path[0])
+            for key in path[1:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = value
+        self._dirty.add(path)
+
+    def _get(self, *path: str):
+        node = getattr(self, path[0])
+        for key in path[1:]:
+            node = node[key]
+        return node
+
     def _write(self) -> None:
-        """Writes the cache to disk. Done internally when there are changes"""
+        """Writes the cache to disk. Done internally when there are changes
+
+        Other processes may have written the cache since we loaded it. Unless this
+        cache was cleaned since, their entries are merged in and only the entries
+        changed here take precedence. Writers are serialized with a lock file and
+        the cache is replaced atomically, so it's never seen half written.
+        """
         path = Path(constants.NETWORK_CACHE_PATH)
         path.parent.mkdir(exist_ok=True, parents=True)
-        with open(path, "w") as f:
-            json.dump(self.__dict__, f, indent=4, sort_keys=True, default=vars)
-            f.write("\n")
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(path.with_name(f"{path.name}.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                on_disk = CachedRequests._read(path)
+                if (
+                    on_disk is not None
+                    and on_disk.last_updated is not None
+                    and self.last_updated is not None
+                    and on_disk.last_updated >= self.last_updated
+                ):
+                    for entry in self._dirty:
+                        on_disk._set(*entry, value=self._get(*entry))
+                    on_disk._dirty = self._dirty
+                    self.__dict__.update(on_disk.__dict__)
+                with open(temp_path, "w") as f:
+                    json.dump(
+                        self.to_dict(),
+                        f,
+                        indent=4,
+                        sort_keys=True,
+                        default=vars
+                    )
+                    f.write("\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, path)
+            self._dirty = set()
+        except OSError as e:
+            logging.warning(f"Failed to write network cache: {e}")
+            temp_path.unlink(missing_ok=True)
 
 
     def _is_fresh(self) -> bool:
@@ -193,42 +933,250 @@ class CachedRequests:
         return True
 
     def clean_if_stale(self, force: bool = False):
-        if force or not self._is_fresh():
+        if force:
             logging.debug("Cleaning out cache…")
-            self = CachedRequests(last_updated=time.time())
+            self.__dict__.update(CachedRequests(last_updated=time.time()).__dict__)
+            self._write()
+        elif not self._is_fresh():
+            # Entries with validators expire on their own and are revalidated
+            # when they're next used, rather than thrown away.
+            logging.debug("Cleaning out stale cache entries…")
+            self.url_size_and_hash = {}
+            self.last_updated = time.time()
             self._write()
         else:
             logging.debug("Cache is valid")
 
 
+T = TypeVar("T")
+
+
 class NetworkRequests:
-    """Uses the cache if found, otherwise retrieves the value from the network."""
+    """Uses the cache if found, otherwise retrieves the value from the network.
+
+    Safe to use from multiple threads. Concurrent lookups of the same value share a
+    single request.
+    """
 
     # This struct uses functions to call due to some of the values requiring parameters
 
     def __init__(self, force_clean: Optional[bool] = None) -> None:
         self._cache = CachedRequests.load()
         self._cache.clean_if_stale(force=force_clean or False)
+        self._cache_lock = threading.RLock()
+        """Held while modifying or writing the cache"""
+        self._in_flight: dict[Hashable, concurrent.futures.Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self._prefetch_slots = threading.BoundedSemaphore(
+            constants.NETWORK_PREFETCH_WORKERS
+        )
+        self._write_timer: Optional[threading.Timer] = None
+        self._parsed_catalogs: dict[tuple[str, str, str], tuple[dict, ReleaseCatalog]] = {}  # noqa: E501
+        atexit.register(self.flush)
+
+    def _write_soon(self) -> None:
+        """Schedules a cache write, so changes made close together share one write"""
+        with self._cache_lock:
+            if self._write_timer is None:
+                self._write_timer = threading.Timer(
+                    constants.NETWORK_CACHE_WRITE_DELAY,
+                    self.flush
+                )
+                self._write_timer.daemon = True
+                self._write_timer.start()
+
+    def flush(self) -> None:
+        """Writes any pending cache changes to disk now"""
+        with self._cache_lock:
+            if self._write_timer is not None:
+                self._write_timer.cancel()
+                self._write_timer = None
+            if self._cache._dirty:
+                self._cache._write()
+
+    def export_cache(self) -> dict:
+        """Returns a copy of every cached value, see import_cache"""
+        with self._cache_lock:
+            output: dict = json.loads(json.dumps(self._cache.to_dict(), default=vars))
+            return output
 
-    def _faithlife_product_releases(
+    def import_cache(self, entries: dict) -> None:
+        """Merges in values exported from another cache.
+
+        They're treated as if they were just fetched, so they are used as-is until
+        they next expire. This is what lets an install run without network access.
+        """
+        imported = CachedRequests.from_dict(dict(entries))
+        now = time.time()
+        with self._cache_lock:
+            for url, validators in imported.http_validators.items():
+                validators["expires"] = now + constants.CACHE_LIFETIME_HOURS * 60 * 60
+                self._cache._set("http_validators", url, value=validators)
+            catalogs = imported.faithlife_product_catalogs
+            for product, versions in catalogs.items():
+                for version, channels in versions.items():
+                    for channel, catalog in channels.items():
+                        self._cache._set(
+                            "faithlife_product_catalogs", product, version, channel,
+                            value=catalog
+                        )
+            for field_name in [
+                "repository_latest_version",
+                "repository_latest_url",
+                "url_size_and_hash",
+                "url_metadata",
+            ]:
+                for key, value in getattr(imported, field_name).items():
+                    self._cache._set(field_name, key, value=value)
+            self._cache._set("last_updated", value=now)
+            self._cache._write()
+
+    def _single_flight(self, key: Hashable, func: Callable[[], T]) -> T:
+        """Runs func, or waits for the result if another thread is already running
+        the lookup identified by key"""
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if future is None:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+        if not owner:
+            logging.debug(f"Waiting on in-flight lookup: {key}")
+            result: T = future.result()
+            return result
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    def _run_in_background(self, task: Callable[[], object]) -> None:
+        def _run():
+            with self._prefetch_slots:
+                try:
+                    task()
+                except Exception as e:
+                    # The lookup is retried when the value is actually used
+                    logging.debug(f"Prefetch failed: {e}")
+        threading.Thread(
+            target=_run,
+            name=f"{constants.APP_NAME} prefetch",
+            daemon=True
+        ).start()
+
+    def prefetch(
+        self,
+        app_release_channel: str,
+        faithlife_product: Optional[str] = None,
+        faithlife_product_version: Optional[str] = None,
+        faithlife_product_release_channel: Optional[str] = None,
+        faithlife_installer_download_url: Optional[str] = None,
+    ) -> None:
+        """Starts all independent metadata lookups at once in the background.
+
+        Fills the cache so later lookups either return immediately or wait on the
+        request already in flight, rather than running one after another.
+        """
+        def _wine_appimage():
+            self._url_size_and_hash(self.wine_appimage_recommended_url())
+
+        def _icu():
+            self._url_size_and_hash(self.icu_latest_version().download_url)
+
+        tasks: list[Callable[[], object]] = [
+            lambda: self.app_latest_version(app_release_channel),
+            _wine_appimage,
+            _icu,
+        ]
+        if (
+            faithlife_product is not None
+            and faithlife_product_version is not None
+            and faithlife_product_release_channel is not None
+        ):
+            tasks.append(lambda: self.faithlife_product_releases(
+                faithlife_product,
+                faithlife_product_version,
+                faithlife_product_release_channel
+            ))
+        if faithlife_installer_download_url is not None:
+            tasks.append(
+                lambda: self._url_size_and_hash(faithlife_installer_download_url)
+            )
+        for task in tasks:
+            self._run_in_background(task)
+
+    def _faithlife_product_catalog(
         self,
         product: Optional[str],
         version: Optional[str],
         channel: Optional[str]
-    ) -> Optional[list[str]]:
+    ) -> Optional[ReleaseCatalog]:
+        """Returns the cached catalog, if any. Never makes a request"""
         if product is None or version is None or channel is None:
             return None
-        releases = self._cache.faithlife_product_releases
-        if product not in releases:
-            releases[product] = {}
-        if version not in releases[product]:
-            releases[product][version] = {}
-        if (
-            channel 
-            not in releases[product][version]
-        ):
+        with self._cache_lock:
+            catalogs = self._cache.faithlife_product_catalogs
+            if channel not in catalogs.get(product, {}).get(version, {}):
+                return None
+            # Parsed once per process, it's looked up often
+            key = (product, version, channel)
+            data = catalogs[product][version][channel]
+            parsed = self._parsed_catalogs.get(key)
+            if parsed is None or parsed[0] is not data:
+                parsed = (data, ReleaseCatalog.from_dict(data))
+                self._parsed_catalogs[key] = parsed
+            return parsed[1]
+
+    def _faithlife_product_releases(
+        self,
+        product: Optional[str],
+        version: Optional[str],
+        channel: Optional[str]
+    ) -> Optional[list[str]]:
+        catalog = self._faithlife_product_catalog(product, version, channel)
+        if catalog is None:
             return None
-        return releases[product][version][channel]
+        return catalog.versions()
+
+    def faithlife_product_catalog(
+        self,
+        product: str,
+        version: str,
+        channel: str
+    ) -> ReleaseCatalog:
+        def _fetch() -> ReleaseCatalog:
+            output = self._faithlife_product_catalog(product, version, channel)
+            url = _faithlife_product_releases_url(version, channel)
+            cached = output is not None and len(output) > 0
+            if output is not None and cached and self._is_fresh(url):
+                return output
+            catalog, url_metadata, validators = _get_faithlife_product_releases(
+                faithlife_product=product,
+                faithlife_product_version=version,
+                faithlife_product_release_channel=channel,
+                validators=self._cache.http_validators.get(url) if cached else None
+            )
+            with self._cache_lock:
+                if catalog is not None:
+                    self._cache._set(
+                        "faithlife_product_catalogs", product, version, channel,
+                        value=catalog.to_dict()
+                    )
+                self._store_url_metadata(url_metadata)
+                self._store_validators(url, validators)
+                self._write_soon()
+                output = self._faithlife_product_catalog(product, version, channel)
+                assert output is not None
+                return output
+        return self._single_flight(
+            ("faithlife_product_catalog", product, version, channel),
+            _fetch
+        )
 
     def faithlife_product_releases(
         self,
@@ -236,35 +1184,158 @@ class NetworkRequests:
         version: str,
         channel: str
     ) -> list[str]:
-        output = self._faithlife_product_releases(product, version, channel)
-        if output is not None and len(output) > 0:
-            return output
-        output = _get_faithlife_product_releases(
-            faithlife_product=product,
-            faithlife_product_version=version,
-            faithlife_product_release_channel=channel
-        )
-        self._cache.faithlife_product_releases[product][version][channel] = output
-        self._cache._write()
-        return output
+        """Releases of the product, newest first"""
+        return self.faithlife_product_catalog(product, version, channel).versions()
+
+    def _is_fresh(self, url: str) -> bool:
+        """Whether values parsed from url may be used without asking the server"""
+        entry = self._cache.http_validators.get(url)
+        if entry is None:
+            return False
+        expires = entry.get("expires")
+        return isinstance(expires, (int, float)) and expires > time.time()
+
+    def _store_validators(
+        self,
+        url: str,
+        validators: dict[str, Optional[str | float]],
+        ttl: float = constants.CACHE_LIFETIME_HOURS * 60 * 60
+    ):
+        """Saves validators for url, valid for ttl seconds before revalidating"""
+        validators["expires"] = time.time() + ttl
+        self._cache._set("http_validators", url, value=validators)
     
+    def _github_rate_limit(self) -> dict[str, Optional[float]]:
+        """Returns the latest known GitHub API budget, from any process"""
+        with self._cache_lock:
+            on_disk = CachedRequests._read(Path(constants.NETWORK_CACHE_PATH))
+            ours = self._cache.github_rate_limit
+            if (
+                on_disk is not None
+                and (on_disk.github_rate_limit.get("observed") or 0)
+                > (ours.get("observed") or 0)
+            ):
+                # Not marked dirty, it's already on disk
+                self._cache.github_rate_limit = on_disk.github_rate_limit
+            return self._cache.github_rate_limit
+
+    def _record_github_rate_limit(self, response: requests.Response):
+        headers = response.headers
+        rate_limit: dict[str, Optional[float]] = {"observed": time.time()}
+        try:
+            if "X-RateLimit-Remaining" in headers:
+                rate_limit["remaining"] = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset" in headers:
+                rate_limit["reset"] = float(headers["X-RateLimit-Reset"])
+            if "Retry-After" in headers:
+                rate_limit["blocked_until"] = time.time() + float(headers["Retry-After"])  # noqa: E501
+        except ValueError:
+            logging.debug(f"Ignoring malformed rate limit headers: {headers}")
+            return
+        if len(rate_limit) == 1:
+            return
+        logging.debug(f"GitHub API rate limit: {rate_limit}")
+        with self._cache_lock:
+            self._cache._set("github_rate_limit", value=rate_limit)
+            self._write_soon()
+
+    def _github_wait(self) -> tuple[float, Optional[float]]:
+        """Returns how long to wait before the GitHub API may be asked again, and
+        until when"""
+        rate_limit = self._github_rate_limit()
+        now = time.time()
+        until = rate_limit.get("blocked_until")
+        if until is None or until <= now:
+            until = None
+        if rate_limit.get("remaining") == 0:
+            reset = rate_limit.get("reset")
+            if reset is not None and reset > now:
+                until = max(until or 0, reset)
+        if until is None:
+            return 0, None
+        return until - now, until
+
+    def _github_get(
+        self,
+        url: str,
+        validators: Optional[dict[str, Optional[str | float]]] = None
+    ) -> tuple[Optional[bytes], dict[str, Optional[str | float]]]:
+        """_net_get_if_modified for the GitHub API, within its rate limit
+
+        Waits out short limits, with jitter so processes don't retry in step, and
+        retries requests the API refused for being rate limited.
+
+        Raises:
+            GitHubRateLimitExceeded - if the budget won't reset soon enough to wait
+            requests.exceptions.RequestException - on other failures
+        """
+        attempt = 0
+        while True:
+            wait, until = self._github_wait()
+            if wait > constants.GITHUB_RATE_LIMIT_MAX_WAIT:
+                raise GitHubRateLimitExceeded(until)
+            if wait > 0:
+                wait += random.uniform(0, constants.NETWORK_RETRY_BACKOFF)
+                logging.info(f"Waiting {wait:.1f}s for the GitHub API rate limit")
+                time.sleep(wait)
+            try:
+                return _net_get_if_modified(
+                    url,
+                    validators,
+                    on_response=self._record_github_rate_limit
+                )
+            except requests.exceptions.HTTPError as e:
+                if (
+                    e.response is None
+                    or e.response.status_code not in [403, 429]
+                    or attempt >= constants.NETWORK_RETRIES
+                ):
+                    raise
+                wait, until = self._github_wait()
+                if wait == 0:
+                    # Refused without saying for how long, back off exponentially
+                    delay = constants.NETWORK_RETRY_BACKOFF * 2 ** attempt
+                    delay *= random.uniform(1, 2)
+                    logging.info(f"GitHub API refused the request, retrying in {delay:.1f}s")  # noqa: E501
+                    time.sleep(delay)
+                attempt += 1
+
+    def _store_url_metadata(self, url_metadata: dict[str, dict]):
+        for download_url, metadata in url_metadata.items():
+            if self._cache.url_metadata.get(download_url) != metadata:
+                self._cache._set("url_metadata", download_url, value=metadata)
+
     def wine_appimage_recommended_url(self) -> str:
         repo = "FaithLife-Community/wine-appimages"
         return self._repo_latest_version(repo).download_url
 
     def _url_size_and_hash(self, url: str) -> tuple[Optional[int], Optional[str]]:
         """Attempts to get the size and hash from a URL.
-        Uses cache if it exists
+        Uses cache if it exists, then the metadata published with the release, and
+        only asks the server as a last resort
         
         Returns:
-            bytes - from the Content-Length leader
-            md5_hash - from the Content-MD5 header or S3's etag
+            bytes - from the release metadata or the Content-Length leader
+            md5_hash - from the Content-MD5 header or S3's etag. None if the release
+                metadata had a sha256, which is checked instead
         """
-        if url not in self._cache.url_size_and_hash:
-            props = UrlProps(url)
-            self._cache.url_size_and_hash[url] = props.size, props.md5
-            self._cache._write()
-        return self._cache.url_size_and_hash[url]
+        def _fetch() -> tuple[Optional[int], Optional[str]]:
+            # Only if there's a digest to check, a size alone isn't enough
+            metadata = self._cache.url_metadata.get(url)
+            if (
+                metadata is not None
+                and isinstance(metadata.get("size"), int)
+                and metadata.get("sha256") is not None
+            ):
+                return metadata["size"], None  # type: ignore[return-value]
+            if url not in self._cache.url_size_and_hash:
+                props = UrlProps(url)
+                size, md5 = props.size, props.md5
+                with self._cache_lock:
+                    self._cache._set("url_size_and_hash", url, value=(size, md5))
+                    self._write_soon()
+            return self._cache.url_size_and_hash[url]
+        return self._single_flight(("url_size_and_hash", url), _fetch)
 
     def url_size(self, url: str) -> Optional[int]:
         return self._url_size_and_hash(url)[0]
@@ -272,19 +1343,59 @@ class NetworkRequests:
     def url_md5(self, url: str) -> Optional[str]:
         return self._url_size_and_hash(url)[1]
 
+    def url_sha256(self, url: str) -> Optional[str]:
+        """Hex sha256 published with the release, if any. Never makes a request"""
+        sha256 = self._cache.url_metadata.get(url, {}).get("sha256")
+        return sha256 if isinstance(sha256, str) else None
+
     def _repo_latest_version(self, repository: str) -> SoftwareReleaseInfo:
-        if (
-            repository not in self._cache.repository_latest_version
-            or repository not in self._cache.repository_latest_url
-        ):
-            result = _get_latest_release_data(repository)
-            self._cache.repository_latest_version[repository] = result.version
-            self._cache.repository_latest_url[repository] = result.download_url
-            self._cache._write()
-        return SoftwareReleaseInfo(
-            version=self._cache.repository_latest_version[repository],
-            download_url=self._cache.repository_latest_url[repository]
-        )
+        def _fetch() -> SoftwareReleaseInfo:
+            url = _github_latest_release_url(repository)
+            cached = (
+                repository in self._cache.repository_latest_version
+                and repository in self._cache.repository_latest_url
+            )
+            if not cached or not self._is_fresh(url):
+                try:
+                    result, url_metadata, validators = _get_latest_release_data(
+                        repository,
+                        validators=self._cache.http_validators.get(url) if cached else None,  # noqa: E501
+                        get=self._github_get
+                    )
+                except Exception as e:
+                    if not cached:
+                        raise
+                    # Better an outdated answer than none at all
+                    logging.warning(f"Using the cached release of {repository}, failed to check for a newer one: {e}")  # noqa: E501
+                    result, url_metadata = None, {}
+                    # Try again after the limit resets, rather than every time
+                    _, until = self._github_wait()
+                    validators = dict(self._cache.http_validators.get(url) or {})
+                    ttl = max((until or 0) - time.time(), constants.NETWORK_RETRY_BACKOFF)  # noqa: E501
+                else:
+                    ttl = constants.CACHE_LIFETIME_HOURS * 60 * 60
+                with self._cache_lock:
+                    self._store_url_metadata(url_metadata)
+                    if result is not None:
+                        self._cache._set(
+                            "repository_latest_version", repository,
+                            value=result.version
+                        )
+                        self._cache._set(
+                            "repository_latest_url", repository,
+                            value=result.download_url
+                        )
+                    self._store_validators(url, validators, ttl=ttl)
+                    self._write_soon()
+            download_url = self._cache.repository_latest_url[repository]
+            metadata = self._cache.url_metadata.get(download_url, {})
+            return SoftwareReleaseInfo(
+                version=self._cache.repository_latest_version[repository],
+                download_url=download_url,
+                download_size=metadata.get("size"),  # type: ignore[arg-type]
+                download_sha256=metadata.get("sha256"),  # type: ignore[arg-type]
+            )
+        return self._single_flight(("repository_latest", repository), _fetch)
 
     def app_latest_version(self, channel: str) -> SoftwareReleaseInfo:
         if channel == "stable":
@@ -304,11 +1415,36 @@ def logos_reuse_download(
     app: App,
     status_messages: bool = True
 ):
+    try:
+        file_path = reuse_or_download(sourceurl, file, app, status_messages)
+    except NotEnoughDiskSpace as e:
+        app.exit(f"Not enough disk space to download {file}: {e}")
+    if file_path is None:
+        app.exit(f"Bad file size or checksum: {Path(app.conf.download_dir) / file}")
+    logging.debug(f"Placing {file} into {targetdir}")
+    store.artifact_store.place_file(file_path, targetdir)
+
+
+def reuse_or_download(
+    sourceurl: str,
+    file: str,
+    app: App,
+    status_messages: bool = True
+) -> Optional[Path]:
+    """Finds a verified copy of file in the download directories, or downloads it
+    into the app's download directory
+
+    Returns:
+        Path - of the verified file
+        None - if the download failed verification
+
+    Raises:
+        NotEnoughDiskSpace - before downloading, if the file won't fit
+    """
     dirs = [
         app.conf.user_download_dir,
         app.conf.download_dir,
     ]
-    found = 1
     for i in dirs:
         if i is not None:
             logging.debug(f"Checking {i} for {file}.")
@@ -322,140 +1458,419 @@ def logos_reuse_download(
                     status_messages=status_messages
                 ):
                     logging.info(f"{file} properties match. Using it…")
-                    logging.debug(f"Copying {file} into {targetdir}")
-                    try:
-                        shutil.copy(os.path.join(i, file), targetdir)
-                    except shutil.SameFileError:
-                        pass
-                    found = 0
-                    break
+                    return file_path
                 else:
                     logging.info(f"Incomplete file: {file_path}.")
-    if found == 1:
-        file_path = Path(os.path.join(app.conf.download_dir, file))
-        # Start download.
-        _net_get(
+    file_path = Path(os.path.join(app.conf.download_dir, file))
+    # Start download, from a peer on the LAN if possible.
+    downloaded_props = _net_get_from_peers(sourceurl, file_path, app)
+    if downloaded_props is None:
+        downloaded_props = _net_get(
             sourceurl,
             target=file_path,
             app=app,
         )
-        if _verify_downloaded_file(
-            sourceurl,
-            file_path,
-            app=app,
-            status_messages=status_messages
-        ):
-            logging.debug(f"Copying: {file} into: {targetdir}")
-            try:
-                shutil.copy(os.path.join(app.conf.download_dir, file), targetdir)
-            except shutil.SameFileError:
-                pass
-        else:
-            app.exit(f"Bad file size or checksum: {file_path}")
+    if not _verify_downloaded_file(
+        sourceurl,
+        file_path,
+        app=app,
+        status_messages=status_messages,
+        file_props=downloaded_props
+    ):
+        return None
+    file_path.with_name(f"{file_path.name}.journal").unlink(missing_ok=True)
+    sha256 = store.artifact_store.add(file_path)
+    # Make room for it, keeping it and whatever the install uses
+    try:
+        store.collect_garbage(app, keep={sha256})
+    except OSError as e:
+        logging.warning(f"Failed to clean up the download cache: {e}")
+    return file_path
 
 
 # FIXME: refactor to raise rather than return None
 def _net_get(url: str, target: Optional[Path]=None, app: Optional[App] = None):
-    # TODO:
-    # - Check available disk space before starting download
+    """Downloads url
+
+    Returns:
+        bytes - the content of the url if target is None
+        FileProps - of target if given, with digests computed during the download
+        None - on failure
+    """
     logging.debug(f"Download source: {url}")
     logging.debug(f"Download destination: {target}")
+    if target is None:  # return url content as bytes
+        try:
+            content, _ = _net_get_if_modified(url)
+        except requests.exceptions.RequestException:
+            return None
+        return content
     target_props = FileProps(target)  # sets path and size attribs
     if app and target_props.path:
         app.status(f"Downloading {target_props.path.name}…")
-    parsed_url = urlparse(url)
-    domain = parsed_url.netloc  # Gets the requested domain
     url_props = UrlProps(url)  # uses requests to set headers, size, md5 attribs
 
     # Initialize variables.
-    local_size = 0
     total_size = url_props.size  # None or int
     logging.debug(f"File size on server: {total_size}")
-    percent = None
+    if target_props.path is not None:
+        check_disk_space(target_props.path, total_size)
     chunk_size = 100 * 1024  # 100 KB default
     if type(total_size) is int:
         # Use smaller of 2% of filesize or 2 MB for chunk_size.
         chunk_size = min([int(total_size / 50), 2 * 1024 * 1024])
     # Force non-compressed file transfer for accurate progress tracking.
     headers = {'Accept-Encoding': 'identity'}
-    file_mode = 'wb'
-
-    # If file exists and URL is resumable, set download Range.
-    if target_props.size:
-        logging.debug(f"File exists: {str(target_props.path)}")
-        local_size = target_props.size
-        logging.info(f"Current downloaded size in bytes: {local_size}")
-        if url_props.headers.get('Accept-Ranges') == 'bytes':
-            logging.debug("Server accepts byte range; attempting to resume download.")  # noqa: E501
-            file_mode = 'ab'
-            if type(url_props.size) is int:
-                headers['Range'] = f'bytes={local_size}-{total_size}'
-            else:
-                headers['Range'] = f'bytes={local_size}-'
-
-    logging.debug(f"{chunk_size=}; {file_mode=}; {headers=}")
+    progress = DownloadProgress(
+        total_size,
+        url=url_props.path,
+        name=target_props.path.name if target_props.path else None
+    )
 
-    # Log download type.
-    if 'Range' in headers.keys():
-        message = f"Continuing download for {url_props.path}."
-    else:
-        message = f"Starting new download for {url_props.path}."
-    logging.info(message)
+    # Fetch over byte ranges whenever the server supports them. This resumes
+    # interrupted downloads and repairs corrupted ones, only fetching the chunks
+    # the journal can't vouch for, and splits large files across connections.
+    if (
+        target_props.path is not None
+        and url_props.headers.get('Accept-Ranges') == 'bytes'
+        and type(total_size) is int
+        and total_size > 0
+    ):
+        segment_count = None
+        if total_size < constants.DOWNLOAD_SEGMENT_MIN_SIZE:
+            segment_count = 1
+        journal = DownloadJournal.load(
+            target_props.path,
+            url_props.path,
+            total_size,
+            etag=url_props.headers.get('ETag')
+        )
+        for attempt in range(constants.NETWORK_RETRIES + 1):
+            try:
+                hasher = _net_get_segmented(
+                    url_props.path,
+                    target_props.path,
+                    total_size,
+                    chunk_size,
+                    app=app,
+                    segment_count=segment_count,
+                    journal=journal,
+                    progress=progress
+                )
+            except NotEnoughDiskSpace:
+                raise
+            except (requests.exceptions.RequestException, OSError) as e:
+                logging.warning(f"Ranged download attempt {attempt + 1} failed: {e}")  # noqa: E501
+                progress.retries += 1
+                continue
+            if (
+                url_props.md5 is not None
+                and hasher.md5 != url_props.md5
+                and journal.reused > 0
+            ):
+                # Every chunk matched what was written, so the bad data must
+                # have arrived that way. There's no telling which chunk it's in.
+                logging.warning(f"{target_props.path} doesn't match the server's checksum; fetching it again.")  # noqa: E501
+                journal.chunks = {}
+                progress.retries += 1
+                continue
+            progress.finish(app, ok=True)
+            return FileProps(target_props.path, hasher=hasher)
+        logging.warning("Ranged download failed, falling back to a single connection.")  # noqa: E501
+
+    logging.info(f"Starting new download for {url_props.path}.")
+    logging.debug(f"{chunk_size=}; {headers=}")
 
     # Initiate download request.
     try:
-        # FIXME: consider splitting this into two functions with a common base.
-        # One that writes into a file, and one that returns a str, 
-        # that share most of the internal logic
-        if target_props.path is None:  # return url content as text
-            with requests.get(url_props.path, headers=headers) as r:
-                if callable(r):
-                    logging.error("Failed to retrieve data from the URL.")
-                    return None
-
-                try:
-                    r.raise_for_status()
-                except requests.exceptions.HTTPError as e:
-                    if domain == "github.com":
-                        if (
-                            e.response.status_code == 403
-                            or e.response.status_code == 429
-                        ):
-                            logging.error("GitHub API rate limit exceeded. Please wait before trying again.")  # noqa: E501
-                    else:
-                        logging.error(f"HTTP error occurred: {e.response.status_code}")  # noqa: E501
-                    return None
-
-                return r._content  # raw bytes
-        else:  # download url to target.path
-            with requests.get(url_props.path, stream=True, headers=headers) as r:
-                with target_props.path.open(mode=file_mode) as f:
-                    if file_mode == 'wb':
-                        mode_text = 'Writing'
-                    else:
-                        mode_text = 'Appending'
-                    logging.debug(f"{mode_text} data to file {target_props.path}.")
+        if target_props.path is not None:  # download url to target.path
+            hasher = FileHasher(sha256=True)
+            progress.done = 0
+            with get_session().get(url_props.path, stream=True, headers=headers) as r:  # noqa: E501
+                progress.set_source(r)
+                # Never write through a link to a stored artifact
+                target_props.path.unlink(missing_ok=True)
+                with target_props.path.open(mode='wb') as f:
+                    if type(total_size) is int:
+                        preallocate(f.fileno(), total_size)
+                    logging.debug(f"Writing data to file {target_props.path}.")
                     for chunk in r.iter_content(chunk_size=chunk_size):
                         f.write(chunk)
-                        local_size = os.fstat(f.fileno()).st_size
-                        if type(total_size) is int:
-                            percent = round(local_size / total_size * 10)
-                            # if None not in [app, evt]:
-                            if app:
-                                # Show dots corresponding to show download progress
-                                # While we could use percent, it's likely to interfere
-                                # With whatever install step we are on
-                                message = "Downloading" + "." * percent + "\r"
-                                app.status(message)
+                        hasher.update(chunk)
+                        progress.add(len(chunk))
+                        progress.report(app)
+                    # Drops any preallocated space the server didn't fill
+                    f.truncate(progress.done)
+            progress.finish(app, ok=True)
+            return FileProps(target_props.path, hasher=hasher)
     except requests.exceptions.RequestException as e:
         logging.error(f"Error occurred during HTTP request: {e}")
+        progress.finish(app, ok=False)
         return None  # Return None values to indicate an error condition
 
 
-def _verify_downloaded_file(url: str, file_path: Path | str, app: App, status_messages: bool = True): #noqa: E501
+def peer_artifact_path(
+    md5: Optional[str] = None,
+    sha256: Optional[str] = None
+) -> str:
+    """Returns the URL path peer caches serve the file with the given digest on
+
+    Args:
+        md5 - base64 encoded, in the same format as the Content-MD5 header
+        sha256 - hex encoded, used instead of md5 if given
+    """
+    if sha256 is not None:
+        return f"/sha256/{sha256}"
+    if md5 is None:
+        raise ValueError("A digest is required")
+    return f"/md5/{b64decode(md5).hex()}"
+
+
+def _net_get_from_peers(url: str, target: Path, app: App) -> Optional[FileProps]:
+    """Tries to download url's file from the peer caches on the LAN (see peers.py)
+
+    Only done when the upstream sha256 or md5 is known, so that what a peer sends
+    can be checked against it.
+
+    Returns:
+        FileProps - of target, if a peer had a copy matching the upstream digest
+        None - otherwise
+    """
+    peer_urls = app.conf.peer_cache_urls
+    if len(peer_urls) == 0:
+        return None
+    sha256 = app.conf._network.url_sha256(url)
+    md5 = app.conf._network.url_md5(url)
+    if sha256 is None and md5 is None:
+        logging.debug(f"Not using peer caches for {url}, its checksum is unknown")
+        return None
+    for peer_url in peer_urls:
+        app.status(f"Downloading {target.name} from {peer_url}…")
+        hasher = FileHasher(sha256=True)
+        try:
+            with get_session().get(
+                peer_url.rstrip("/") + peer_artifact_path(md5=md5, sha256=sha256),
+                stream=True,
+                timeout=constants.PEER_CACHE_TIMEOUT
+            ) as r:
+                if r.status_code != 200:
+                    logging.info(f"Peer cache {peer_url} doesn't have {target.name}")  # noqa: E501
+                    continue
+                # Never write through a link to a stored artifact
+                target.unlink(missing_ok=True)
+                with target.open("wb") as f:
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+                        hasher.update(chunk)
+        except (requests.exceptions.RequestException, OSError) as e:
+            logging.info(f"Failed to download from peer cache {peer_url}: {e}")
+            target.unlink(missing_ok=True)
+            continue
+        if (sha256 is None or hasher.sha256 == sha256) and (
+            md5 is None or hasher.md5 == md5
+        ):
+            logging.info(f"Downloaded {target.name} from peer cache {peer_url}")
+            return FileProps(target, hasher=hasher)
+        logging.warning(f"Peer cache {peer_url} sent {target.name} with the wrong checksum")  # noqa: E501
+        target.unlink(missing_ok=True)
+    return None
+
+
+def _net_get_if_modified(
+    url: str,
+    validators: Optional[dict[str, Optional[str | float]]] = None,
+    on_response: Optional[Callable[[requests.Response], None]] = None
+) -> tuple[Optional[bytes], dict[str, Optional[str | float]]]:
+    """Fetches url, unless the copy described by validators is still current.
+
+    Args:
+        validators: etag and/or last_modified of a previous response from url
+        on_response: called with every response, including errors
+
+    Returns:
+        content - the response body, None if the server replied 304 Not Modified
+        validators - etag and last_modified to send when revalidating next time
+
+    Raises:
+        requests.exceptions.RequestException - on failure
+    """
+    headers = _github_headers(url)
+    if validators is not None:
+        if isinstance(validators.get("etag"), str):
+            headers["If-None-Match"] = str(validators["etag"])
+        if isinstance(validators.get("last_modified"), str):
+            headers["If-Modified-Since"] = str(validators["last_modified"])
+    domain = urlparse(url).netloc  # Gets the requested domain
+    try:
+        with get_session().get(url, headers=headers) as r:
+            if on_response is not None:
+                on_response(r)
+            if r.status_code == 304 and validators is not None:
+                logging.debug(f"{url} is unchanged since it was cached.")
+                return None, {
+                    "etag": r.headers.get("ETag") or validators.get("etag"),
+                    "last_modified": (
+                        r.headers.get("Last-Modified")
+                        or validators.get("last_modified")
+                    ),
+                }
+            r.raise_for_status()
+            return r.content, {
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+            }
+    except requests.exceptions.HTTPError as e:
+        if (
+            domain.endswith("github.com")
+            and e.response is not None
+            and e.response.status_code in [403, 429]
+        ):
+            logging.error("GitHub API rate limit exceeded. Please wait before trying again.")  # noqa: E501
+        elif e.response is not None:
+            logging.error(f"HTTP error occurred: {e.response.status_code}")
+        raise
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error occurred during HTTP request: {e}")
+        raise
+
+
+def _net_get_segmented(
+    url: str,
+    target: Path,
+    total_size: int,
+    chunk_size: int,
+    app: Optional[App] = None,
+    segment_count: Optional[int] = None,
+    journal: Optional[DownloadJournal] = None,
+    progress: Optional[DownloadProgress] = None
+) -> FileHasher:
+    """Downloads url into target by fetching byte ranges over parallel connections.
+
+    The data is written into a `.part` file next to target which is renamed into
+    place once every range has finished. Chunks of an earlier attempt (or of
+    target itself) that the journal shows are intact are kept, only the rest is
+    fetched. On failure the `.part` file and journal are left for the next attempt.
+
+    Returns:
+        FileHasher - digests of the downloaded file
+
+    Raises:
+        requests.exceptions.RequestException - if any range fails or the server
+            ignores the Range header
+        OSError - if the file could not be written
+    """
+    if segment_count is None:
+        segment_count = constants.DOWNLOAD_SEGMENT_COUNT
+    if journal is None:
+        journal = DownloadJournal(target, url, total_size)
+    part_path = target.with_name(f"{target.name}.part")
+    if not part_path.exists() and target.exists():
+        if target.stat().st_nlink > 1:
+            # Shares its data with a stored artifact, writing to it would damage
+            # the artifact too
+            target.unlink()
+        else:
+            # Continue from (or repair) an earlier download into target
+            os.replace(target, part_path)
+
+    hasher = FileHasher(sha256=True)
+    if progress is None:
+        progress = DownloadProgress(total_size, url=url, name=target.name)
+    cancelled = threading.Event()
+
+    def _fetch_range(fd: int, start: int, end: int):
+        headers = {
+            'Accept-Encoding': 'identity',
+            'Range': f"bytes={start}-{end}",
+        }
+        offset = start
+        with get_session().get(url, stream=True, headers=headers) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise requests.exceptions.HTTPError(
+                    f"Server ignored range request (status {r.status_code})",
+                    response=r
+                )
+            progress.set_source(r)
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if cancelled.is_set():
+                    return
+                if offset + len(chunk) > end + 1:
+                    raise requests.exceptions.ContentDecodingError(
+                        f"Range {start}-{end} returned too much data"
+                    )
+                os.pwrite(fd, chunk, offset)
+                hasher.update_at(fd, offset, chunk)
+                journal.record(offset, chunk)
+                offset += len(chunk)
+                progress.add(len(chunk))
+        if offset != end + 1:
+            raise requests.exceptions.ChunkedEncodingError(
+                f"Range {start}-{end} ended early at {offset}"
+            )
+
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        missing = journal.check(fd, hasher)
+        os.ftruncate(fd, total_size)
+        preallocate(fd, total_size)
+        progress.done = journal.reused
+        if journal.reused > 0:
+            logging.info(f"Reusing {journal.reused} verified bytes of {part_path}.")
+        ranges = journal.ranges(missing, segment_count)
+        logging.debug(f"Downloading {url} in {len(ranges)} ranges: {ranges}")
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(len(ranges), segment_count)),
+            thread_name_prefix=f"{constants.APP_NAME} download"
+        ) as executor:
+            futures = [
+                executor.submit(_fetch_range, fd, start, end)
+                for start, end in ranges
+            ]
+            pending = set(futures)
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending,
+                    timeout=0.5,
+                    return_when=concurrent.futures.FIRST_EXCEPTION
+                )
+                for future in done:
+                    if future.exception() is not None:
+                        cancelled.set()
+                if cancelled.is_set():
+                    break
+                progress.report(app)
+        # Surfaces the first failure, if any
+        for future in futures:
+            future.result()
+        # Anything still pending is hashed from the file
+        hasher.update_from_file(fd, total_size)
+    except BaseException:
+        os.close(fd)
+        journal.save()
+        raise
+    os.close(fd)
+    journal.save()
+    os.replace(part_path, target)
+    return hasher
+
+def _verify_downloaded_file(
+    url: str,
+    file_path: Path | str,
+    app: App,
+    status_messages: bool = True,
+    file_props: Optional[FileProps] = None
+):
+    """Compares the file's size and digests against what the server reports
+
+    Args:
+        file_props: properties of file_path if already known, for example digests
+            computed while downloading
+    """
     if status_messages:
         app.status(f"Verifying {file_path}…", 0)
-    file_props = FileProps(file_path)
+    if file_props is None:
+        file_props = FileProps(file_path)
     url_size = app.conf._network.url_size(url)
     if url_size is not None and file_props.size != url_size:
         logging.warning(f"{file_path} is the wrong size.")
@@ -464,6 +1879,11 @@ def _verify_downloaded_file(url: str, file_path: Path | str, app: App, status_me
     if url_md5 is not None and file_props.md5 != url_md5:
         logging.warning(f"{file_path} has the wrong MD5 sum.")
         return False
+    url_sha256 = app.conf._network.url_sha256(url)
+    if url_sha256 is not None and file_props.sha256 != url_sha256:
+        logging.warning(f"{file_path} has the wrong SHA-256 sum.")
+        return False
+    logging.debug(f"File hash cache: {file_hash_cache.stats()}")
     logging.debug(f"{file_path} is verified.")
     return True
 
@@ -471,7 +1891,11 @@ def _verify_downloaded_file(url: str, file_path: Path | str, app: App, status_me
 def _get_first_asset_url(json_data: dict) -> str:
     """Parses the github api response to find the first asset's download url
     """
-    assets = json_data.get('assets') or []
+    assets = [
+        asset for asset in json_data.get('assets') or []
+        # Published alongside for delta downloads
+        if not asset.get('name', '').endswith(delta.BLOCK_MAP_SUFFIX)
+    ]
     if len(assets) == 0:
         raise Exception("Failed to find the first asset in the repository data: "
                         f"{json_data}")
@@ -483,6 +1907,27 @@ def _get_first_asset_url(json_data: dict) -> str:
     return download_url
 
 
+def _get_asset_metadata(json_data: dict) -> dict[str, dict[str, Optional[int | str]]]:  # noqa: E501
+    """Parses the github api response for the size and digest of each asset
+
+    Returns:
+        dict - keyed by download url, see CachedRequests.url_metadata
+    """
+    output: dict[str, dict[str, Optional[int | str]]] = {}
+    for asset in json_data.get('assets') or []:
+        download_url = asset.get('browser_download_url')
+        size = asset.get('size')
+        if download_url is None or not isinstance(size, int):
+            continue
+        # Only published for assets uploaded since mid 2025, as "sha256:<hex>"
+        digest: Optional[str] = asset.get('digest')
+        sha256 = None
+        if digest is not None and digest.startswith("sha256:"):
+            sha256 = digest.removeprefix("sha256:").lower()
+        output[download_url] = {"size": size, "sha256": sha256}
+    return output
+
+
 def _get_version_name(json_data: dict) -> str:
     """Gets tag name from json data, strips leading v if exists"""
     tag_name: Optional[str] = json_data.get('tag_name')
@@ -494,19 +1939,41 @@ def _get_version_name(json_data: dict) -> str:
     return tag_name
 
 
-def _get_latest_release_data(repository) -> SoftwareReleaseInfo:
+def _github_latest_release_url(repository: str) -> str:
+    return f"https://api.github.com/repos/{repository}/releases/latest"
+
+
+def _get_latest_release_data(
+    repository: str,
+    validators: Optional[dict[str, Optional[str | float]]] = None,
+    get: Optional[Callable[..., tuple[Optional[bytes], dict[str, Optional[str | float]]]]] = None  # noqa: E501
+) -> tuple[
+    Optional[SoftwareReleaseInfo],
+    dict[str, dict[str, Optional[int | str]]],
+    dict[str, Optional[str | float]]
+]:
     """Gets latest release information
     
     Raises:
         Exception - on failure to make network operation or parse github API
         
     Returns:
-        SoftwareReleaseInfo
+        SoftwareReleaseInfo - None if validators were given and are still current
+        url_metadata - size and digest of each asset, see _get_asset_metadata
+        validators - for revalidating this response later
+
+    Args:
+        get - makes the request, _net_get_if_modified by default
     """
-    release_url = f"https://api.github.com/repos/{repository}/releases/latest"
-    data = _net_get(release_url)
+    if get is None:
+        get = _net_get_if_modified
+    release_url = _github_latest_release_url(repository)
+    try:
+        data, validators = get(release_url, validators)
+    except requests.exceptions.RequestException as e:
+        raise Exception("Could not get latest release URL.") from e
     if data is None:
-        raise Exception("Could not get latest release URL.")
+        return None, {}, validators
     try:
         json_data: dict = json.loads(data.decode())
     except json.JSONDecodeError as e:
@@ -515,10 +1982,14 @@ def _get_latest_release_data(repository) -> SoftwareReleaseInfo:
 
     download_url = _get_first_asset_url(json_data)
     version = _get_version_name(json_data)
+    url_metadata = _get_asset_metadata(json_data)
+    metadata = url_metadata.get(download_url, {})
     return SoftwareReleaseInfo(
         version=version,
-        download_url=download_url
-    )
+        download_url=download_url,
+        download_size=metadata.get("size"),  # type: ignore[arg-type]
+        download_sha256=metadata.get("sha256"),  # type: ignore[arg-type]
+    ), url_metadata, validators
 
 def download_recommended_appimage(app: App):
     wine64_appimage_full_filename = Path(app.conf.wine_appimage_recommended_file_name)  # noqa: E501
@@ -533,52 +2004,82 @@ def download_recommended_appimage(app: App):
             app=app
         )
 
-def _get_faithlife_product_releases(
-    faithlife_product: str,
+def _faithlife_product_releases_url(
     faithlife_product_version: str,
     faithlife_product_release_channel: str
-) -> list[str]:
-    logging.debug(f"Downloading release list for {faithlife_product} {faithlife_product_version}…")  # noqa: E501
+) -> str:
     # NOTE: This assumes that Verbum release numbers continue to mirror Logos.
     if faithlife_product_release_channel == "beta":
-        url = "https://clientservices.logos.com/update/v1/feed/logos10/beta.xml"  # noqa: E501
+        return "https://clientservices.logos.com/update/v1/feed/logos10/beta.xml"  # noqa: E501
     else:
-        url = f"https://clientservices.logos.com/update/v1/feed/logos{faithlife_product_version}/stable.xml"  # noqa: E501
-    
-    response_xml_bytes = _net_get(url)
-    if response_xml_bytes is None:
-        raise Exception("Failed to get logos releases")
+        return f"https://clientservices.logos.com/update/v1/feed/logos{faithlife_product_version}/stable.xml"  # noqa: E501
 
-    # Parse XML
-    root = ET.fromstring(response_xml_bytes.decode('utf-8-sig'))
+
+def _get_faithlife_product_releases(
+    faithlife_product: str,
+    faithlife_product_version: str,
+    faithlife_product_release_channel: str,
+    validators: Optional[dict[str, Optional[str | float]]] = None
+) -> tuple[
+    Optional[ReleaseCatalog],
+    dict[str, dict[str, Optional[int | str]]],
+    dict[str, Optional[str | float]]
+]:
+    """Gets the releases listed in the product's update feed
+
+    Returns:
+        catalog - None if validators were given and are still current
+        url_metadata - size of each download the feed links to with a length,
+            see CachedRequests.url_metadata
+        validators - for revalidating this response later
+    """
+    logging.debug(f"Downloading release list for {faithlife_product} {faithlife_product_version}…")  # noqa: E501
+    url = _faithlife_product_releases_url(
+        faithlife_product_version,
+        faithlife_product_release_channel
+    )
+
+    try:
+        response_xml_bytes, validators = _net_get_if_modified(url, validators)
+    except requests.exceptions.RequestException as e:
+        raise Exception("Failed to get logos releases") from e
+    if response_xml_bytes is None:
+        return None, {}, validators
 
     # Define namespaces
-    namespaces = {
-        'ns0': 'http://www.w3.org/2005/Atom',
-        'ns1': 'http://services.logos.com/update/v1/'
-    }
+    atom = '{http://www.w3.org/2005/Atom}'
+    update = '{http://services.logos.com/update/v1/}'
 
-    # Extract versions
+    # Stream through the feed, only keeping what's needed from each entry
     releases = []
-    # Obtain all listed releases.
-    for entry in root.findall('.//ns1:version', namespaces):
-        if entry.text:
-            releases.append(entry.text)
-        # if len(releases) == 5:
-        #    break
-
+    # Atom links may carry the size of what they point to
+    url_metadata: dict[str, dict[str, Optional[int | str]]] = {}
+    try:
+        for _, element in ET.iterparse(io.BytesIO(response_xml_bytes)):
+            if element.tag == f"{update}version" and element.text:
+                releases.append(element.text)
+            elif element.tag == f"{atom}link":
+                href = element.get('href')
+                length = element.get('length', '')
+                if href is not None and length.isdigit():
+                    url_metadata[href] = {"size": int(length), "sha256": None}
+            elif element.tag == f"{atom}entry":
+                element.clear()
+    except ET.ParseError as e:
+        raise Exception(f"Failed to parse logos releases: {e}") from e
+
+    catalog = ReleaseCatalog.from_versions(releases)
     #Filtering not needed at the moment but left here in case we want it later.
-    #filtered_releases = utils.filter_versions(releases, 40, 1)
-    #logging.debug(f"Available releases: {', '.join(releases)}")
+    #filtered_releases = catalog.below(40)
+    #logging.debug(f"Available releases: {', '.join(catalog.versions())}")
     #logging.debug(f"Filtered releases: {', '.join(filtered_releases)}")
 
-    return releases
+    return catalog, url_metadata, validators
 
 
 def update_lli_binary(app: App):
     lli_file_path = os.path.realpath(sys.argv[0])
     lli_download_path = Path(app.conf.download_dir) / constants.BINARY_NAME
-    temp_path = Path(app.conf.download_dir) / f"{constants.BINARY_NAME}.tmp"
     logging.debug(
         f"Updating {constants.APP_NAME} to latest version by overwriting: {lli_file_path}")  # noqa: E501
 
@@ -591,18 +2092,31 @@ def update_lli_binary(app: App):
             # Remove incompatible file.
             lli_download_path.unlink()
 
+    if not lli_download_path.is_file():
+        # Most of the new binary is usually the same as the running one
+        if delta.download(
+            app.conf.app_latest_version_url,
+            Path(lli_file_path),
+            lli_download_path
+        ):
+            logging.info(f"Downloaded only the changes to {constants.BINARY_NAME}")
+        else:
+            lli_download_path.unlink(missing_ok=True)
+    # Verifies the delta download, or downloads the whole file
     logos_reuse_download(
         app.conf.app_latest_version_url,
         constants.BINARY_NAME,
         app.conf.download_dir,
         app=app,
     )
-    shutil.copy(lli_download_path, temp_path)
     try:
-        shutil.move(temp_path, lli_file_path)
+        # Written next to the binary first, synced and renamed over it, so the
+        # running binary is never partially overwritten, even on power loss
+        strategy = placement.place_file(lli_download_path, lli_file_path, sync=True)
     except Exception as e:
         logging.error(f"Failed to replace the binary: {e}")
         return
+    logging.debug(f"Replaced {lli_file_path} using {strategy}")
 
     os.chmod(sys.argv[0], os.stat(sys.argv[0]).st_mode | 0o111)
     logging.debug(f"Successfully updated {constants.APP_NAME}.")
@@ -0,0 +1,188 @@
+"""Sharing the download cache with other installs on the LAN.
+
+One machine serves its verified download directory over HTTP. Others list it in
+their config (peer_cache_urls) or find it by UDP broadcast (peer_cache_discovery)
+and try it before the upstream server. Files are requested by the sha256 or md5
+upstream reports for them, and checked against it after download, so a peer can't
+hand out anything the upstream server wouldn't have.
+"""
+
+import http.server
+import logging
+import socket
+import threading
+import time
+from base64 import b64decode
+from pathlib import Path
+from typing import Optional
+
+from ou_dedetai.app import App
+
+from . import constants
+from . import network
+
+
+DISCOVERY_REQUEST = f"{constants.BINARY_NAME} peer cache?".encode()
+DISCOVERY_REPLY = f"{constants.BINARY_NAME} peer cache on port".encode()
+
+
+class _CacheRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: "PeerCacheServer"
+
+    def log_message(self, format, *args):
+        logging.debug(f"Peer cache request from {self.client_address[0]}: {format % args}")  # noqa: E501
+
+    def _find(self) -> Optional[Path]:
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] not in ["md5", "sha256"]:
+            return None
+        return self.server.index().get((parts[0], parts[1].lower()))
+
+    def _send_headers(self) -> Optional[Path]:
+        file_path = self._find()
+        if file_path is None:
+            self.send_error(404)
+            return None
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(file_path.stat().st_size))
+        md5 = network.FileProps(file_path).md5
+        if md5 is not None:
+            self.send_header("Content-MD5", md5)
+        self.end_headers()
+        return file_path
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        file_path = self._send_headers()
+        if file_path is None:
+            return
+        self.wfile.flush()
+        with file_path.open("rb") as f:
+            self.connection.sendfile(f)
+
+
+class PeerCacheServer(http.server.ThreadingHTTPServer):
+    """Serves the files in download_dir by digest, see network.peer_artifact_path"""
+    daemon_threads = True
+
+    def __init__(self, download_dir: str, port: int) -> None:
+        super().__init__(("", port), _CacheRequestHandler)
+        self.download_dir = Path(download_dir)
+
+    def index(self) -> dict[tuple[str, str], Path]:
+        """Maps the algorithm and hex digest of each file in the download directory
+        to its path
+
+        Only files matching the size and a digest upstream reported for a download
+        are included. Digests come from the file hash cache, so only new or changed
+        files are read.
+        """
+        # Re-read each time, other processes may have downloaded more since
+        cache = network.CachedRequests.load()
+        known = {
+            (size, md5)
+            for size, md5 in cache.url_size_and_hash.values()
+            if size is not None and md5 is not None
+        }
+        known_sha256 = {
+            (metadata["size"], metadata["sha256"])
+            for metadata in cache.url_metadata.values()
+            if metadata.get("size") is not None and metadata.get("sha256") is not None
+        }
+        known_sizes = {size for size, _ in known | known_sha256}
+        output = {}
+        for file_path in self.download_dir.iterdir():
+            if (
+                not file_path.is_file()
+                or file_path.stat().st_size not in known_sizes
+            ):
+                continue
+            file_props = network.FileProps(file_path)
+            md5 = file_props.md5
+            if md5 is not None and (file_props.size, md5) in known:
+                output[("md5", b64decode(md5).hex())] = file_path
+            sha256 = file_props.sha256
+            if sha256 is not None and (file_props.size, sha256) in known_sha256:
+                output[("sha256", sha256)] = file_path
+        return output
+
+
+def _answer_discovery(http_port: int, stop: threading.Event):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("", constants.PEER_CACHE_PORT))
+        sock.settimeout(1)
+        while not stop.is_set():
+            try:
+                data, address = sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            if data == DISCOVERY_REQUEST:
+                logging.debug(f"Answering peer cache discovery from {address[0]}")
+                sock.sendto(DISCOVERY_REPLY + f" {http_port}".encode(), address)
+
+
+def serve(app: App, port: Optional[int] = None):
+    """Serves the download directory to other installs until interrupted"""
+    if port is None:
+        port = constants.PEER_CACHE_PORT
+    server = PeerCacheServer(app.conf.download_dir, port)
+    stop = threading.Event()
+    discovery = threading.Thread(
+        target=_answer_discovery,
+        args=(port, stop),
+        name=f"{constants.APP_NAME} peer discovery",
+        daemon=True
+    )
+    discovery.start()
+    app.status(f"Serving {app.conf.download_dir} on port {port}. Press Ctrl+C to stop.")  # noqa: E501
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    app.status("Stopped serving the download cache.")
+
+
+def discover(timeout: Optional[float] = None) -> list[str]:
+    """Broadcasts on the LAN for peers serving their download cache
+
+    Returns:
+        list[str] - base URLs of the peers that answered within timeout seconds
+    """
+    if timeout is None:
+        timeout = constants.PEER_CACHE_DISCOVERY_TIMEOUT
+    output: list[str] = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            sock.sendto(
+                DISCOVERY_REQUEST,
+                ("<broadcast>", constants.PEER_CACHE_PORT)
+            )
+        except OSError as e:
+            logging.debug(f"Failed to broadcast for peer caches: {e}")
+            return output
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            sock.settimeout(remaining)
+            try:
+                data, address = sock.recvfrom(1024)
+            except socket.timeout:
+                break
+            if not data.startswith(DISCOVERY_REPLY):
+                continue
+            try:
+                port = int(data.removeprefix(DISCOVERY_REPLY))
+            except ValueError:
+                continue
+            url = f"http://{address[0]}:{port}"
+            if url not in output:
+                output.append(url)
+    logging.debug(f"Discovered peer caches: {output}")
+    return output
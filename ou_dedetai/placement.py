@@ -0,0 +1,210 @@
+"""Copying files with as little data movement as the filesystem allows.
+
+In order of preference a file is:
+- reflinked (FICLONE), sharing its data copy-on-write, on btrfs, xfs, etc.
+- hardlinked, if the caller allows sharing the inode itself
+- copied in the kernel with copy_file_range, which may also offload or share data
+- copied in the kernel with sendfile
+- copied through userspace, as a last resort
+
+Every function reports which of these was used.
+"""
+
+import errno
+import fcntl
+import logging
+import os
+import shutil
+from collections import Counter
+from pathlib import Path
+
+# From linux/fs.h, clone all of one file's extents into another
+FICLONE = 0x40049409
+
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+COPY_FILE_RANGE = "copy_file_range"
+SENDFILE = "sendfile"
+USERSPACE = "userspace"
+
+_NEW_FILE = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+
+# Errors meaning the strategy isn't supported here, rather than that it failed
+_UNSUPPORTED = [
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.ENOSYS,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.EPERM,
+    errno.EBADF,
+]
+
+
+def _copy_data(src_fd: int, dst_fd: int, size: int) -> str:
+    """Copies size bytes between two files without going through userspace if
+    possible
+
+    A strategy that stops short (returning 0 before size bytes were copied) is
+    continued from where it stopped by the next one.
+
+    Raises:
+        OSError - if src ended before size bytes were copied
+    """
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return REFLINK
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED:
+            raise
+
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                n = os.copy_file_range(src_fd, dst_fd, size - copied)
+                if n == 0:
+                    break
+                copied += n
+            if copied == size:
+                return COPY_FILE_RANGE
+        except OSError as e:
+            # Only fall back if nothing was written yet
+            if e.errno not in _UNSUPPORTED or copied > 0:
+                raise
+
+    try:
+        while copied < size:
+            n = os.sendfile(dst_fd, src_fd, copied, size - copied)
+            if n == 0:
+                break
+            copied += n
+        if copied == size:
+            return SENDFILE
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED or copied > 0:
+            raise
+
+    # dst's offset is already past what was copied
+    os.lseek(src_fd, copied, os.SEEK_SET)
+    while copied < size:
+        data = os.read(src_fd, min(1024 * 1024, size - copied))
+        if not data:
+            raise OSError(errno.EIO, f"Only {copied} of {size} bytes could be read")
+        os.write(dst_fd, data)
+        copied += len(data)
+    return USERSPACE
+
+
+def copy_file(src: str | Path, dst: str | Path, hardlink: bool = False) -> str:
+    """Copies src to the new file dst, metadata included, like shutil.copy2
+
+    Args:
+        hardlink - whether dst may be a hardlink to src. Only allow this when
+            neither will be modified in place, as changes would show up in both
+
+    Returns:
+        str - the strategy used, see the module docstring
+    """
+    src_fd = os.open(src, os.O_RDONLY)
+    dst_fd = -1
+    try:
+        size = os.fstat(src_fd).st_size
+        dst_fd = os.open(dst, _NEW_FILE, 0o600)
+        strategy = None
+        if hardlink:
+            try:
+                fcntl.ioctl(dst_fd, FICLONE, src_fd)
+                strategy = REFLINK
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+                os.close(dst_fd)
+                dst_fd = -1
+                os.unlink(dst)
+                try:
+                    os.link(src, dst)
+                    return HARDLINK
+                except OSError:
+                    dst_fd = os.open(dst, _NEW_FILE, 0o600)
+        if strategy is None:
+            strategy = _copy_data(src_fd, dst_fd, size)
+    except BaseException:
+        if dst_fd != -1:
+            os.close(dst_fd)
+            dst_fd = -1
+            Path(dst).unlink(missing_ok=True)
+        raise
+    finally:
+        os.close(src_fd)
+        if dst_fd != -1:
+            os.close(dst_fd)
+    shutil.copystat(src, dst)
+    return strategy
+
+
+def place_file(
+    src: str | Path,
+    dst: str | Path,
+    hardlink: bool = False,
+    sync: bool = False
+) -> str:
+    """Copies src over dst atomically, so dst is never seen partially written
+
+    See copy_file for the other arguments.
+
+    Args:
+        sync - whether to flush the copy and the rename to disk before returning,
+            so after a crash dst is either the old or the new file, never empty
+
+    Returns:
+        str - the strategy used, see the module docstring
+    """
+    dst = Path(dst)
+    temp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    temp_path.unlink(missing_ok=True)
+    try:
+        strategy = copy_file(src, temp_path, hardlink=hardlink)
+        if sync:
+            fd = os.open(temp_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.replace(temp_path, dst)
+        if sync:
+            dir_fd = os.open(dst.parent, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    logging.debug(f"Placed {src} at {dst} using {strategy}")
+    return strategy
+
+
+def copy_tree(
+    src: str | Path,
+    dst: str | Path,
+    symlinks: bool = False
+) -> Counter[str]:
+    """Copies the directory src to the new directory dst, like shutil.copytree
+
+    Args:
+        symlinks - whether to copy symlinks as symlinks, rather than what they
+            point to
+
+    Returns:
+        Counter - number of files copied with each strategy
+    """
+    strategies: Counter[str] = Counter()
+
+    def _copy(s: str, d: str) -> str:
+        strategies[copy_file(s, d)] += 1
+        return d
+
+    shutil.copytree(src, dst, symlinks=symlinks, copy_function=_copy)
+    logging.debug(f"Copied {src} to {dst}: {dict(strategies)}")
+    return strategies
@@ -0,0 +1,232 @@
+"""Configured wineprefixes kept as templates, so new installs needn't build one.
+
+Initializing a wineprefix (wineboot --init) and configuring its registry takes
+minutes. Once a new prefix has been set up, a copy of it is kept in the cache
+directory as the template for its wine build. Installs with the same wine build
+clone the template instead, reflinking its files where the filesystem allows
+(otherwise copying them in the kernel), then fix up the paths that depend on the
+user and on where the prefix is.
+
+Templates aren't hardlinked into prefixes, as installers overwrite files in
+system32 and elsewhere in place, which would change the template too.
+"""
+
+import getpass
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Optional
+
+from ou_dedetai.app import App
+
+from . import constants
+from . import network
+from . import placement
+from . import system
+
+TEMPLATE_FORMAT = 1
+"""Version of what a template holds, bumped when the prefix configuration changes
+so older templates aren't used"""
+_METADATA = "template.json"
+_PREFIX = "prefix"
+
+
+def _wine_user() -> str:
+    """Name of the prefix's user directory, which wine takes from the Unix user"""
+    return os.environ.get("USER") or getpass.getuser()
+
+
+def fingerprint(app: App) -> Optional[str]:
+    """Identifies the wine build, so templates are only used with the build that
+    made them
+
+    Returns:
+        str - None if the wine build couldn't be identified
+    """
+    wine64_binary = Path(app.conf.wine64_binary).resolve()
+    sha256 = network.FileProps(wine64_binary).sha256
+    if sha256 is None:
+        return None
+    try:
+        version = subprocess.run(
+            [str(wine64_binary), "--version"],
+            env=system.fix_ld_library_path(os.environ.copy()),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.debug(f"Failed to get the version of {wine64_binary}: {e}")
+        return None
+    key = json.dumps([TEMPLATE_FORMAT, str(wine64_binary), sha256, version])
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _template_dir(key: str) -> Path:
+    return Path(constants.WINEPREFIX_TEMPLATE_DIR) / key
+
+
+def _load_metadata(template_dir: Path) -> Optional[dict]:
+    """Returns the user, home and prefix the template was made with, and when it
+    was last_used"""
+    try:
+        with (template_dir / _METADATA).open("r") as f:
+            metadata: dict = json.load(f)
+        return metadata
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring wineprefix template {template_dir}: {e}")
+        return None
+
+
+def _save_metadata(template_dir: Path, metadata: dict):
+    temp_path = template_dir / f".{_METADATA}.{os.getpid()}.tmp"
+    with temp_path.open("w") as f:
+        json.dump(metadata, f, indent=4, sort_keys=True)
+    os.replace(temp_path, template_dir / _METADATA)
+
+
+def _prune(keep: int):
+    """Removes all but the keep most recently used templates"""
+    templates = []
+    for template_dir in Path(constants.WINEPREFIX_TEMPLATE_DIR).iterdir():
+        if template_dir.name.startswith("."):
+            continue
+        metadata = _load_metadata(template_dir) or {}
+        templates.append((metadata.get("last_used", 0), template_dir))
+    for _, template_dir in sorted(templates, reverse=True)[keep:]:
+        logging.info(f"Removing unused wineprefix template {template_dir}")
+        shutil.rmtree(template_dir, ignore_errors=True)
+
+
+def capture(app: App):
+    """Keeps a copy of the wineprefix as the template for its wine build
+
+    Only call this on a prefix that was just initialized and configured, so
+    nothing installed since ends up in every new prefix.
+    """
+    key = fingerprint(app)
+    if key is None:
+        return
+    template_dir = _template_dir(key)
+    if template_dir.is_dir():
+        return
+    app.status("Saving wineprefix template for future installs…")
+    temp_dir = template_dir.with_name(f".{key}.{os.getpid()}.tmp")
+    try:
+        temp_dir.mkdir(parents=True)
+        strategies = placement.copy_tree(
+            app.conf.wine_prefix,
+            temp_dir / _PREFIX,
+            symlinks=True
+        )
+        _save_metadata(temp_dir, {
+            "user": _wine_user(),
+            "home": str(Path.home()),
+            "prefix": str(Path(app.conf.wine_prefix).absolute()),
+            "last_used": time.time(),
+        })
+        os.rename(temp_dir, template_dir)
+        logging.info(f"Saved wineprefix template {template_dir}: {dict(strategies)}")  # noqa: E501
+    except OSError as e:
+        # Including another process saving the same template first
+        logging.warning(f"Failed to save wineprefix template: {e}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return
+    _prune(constants.WINEPREFIX_TEMPLATE_KEEP)
+
+
+def _fix_up(prefix: Path, location: Path, metadata: dict):
+    """Adjusts a freshly cloned prefix for the current user and its location
+
+    Args:
+        prefix - the cloned prefix
+        location - where the cloned prefix will be moved to
+    """
+    old_user, new_user = metadata["user"], _wine_user()
+    if old_user != new_user:
+        users_dir = prefix / "drive_c" / "users"
+        if (users_dir / old_user).is_dir() and not (users_dir / new_user).exists():
+            os.rename(users_dir / old_user, users_dir / new_user)
+        # Backslashes are escaped in the hives
+        old_path = f"\\\\users\\\\{old_user}"
+        new_path = f"\\\\users\\\\{new_user}"
+        for hive in prefix.glob("*.reg"):
+            text = hive.read_text(encoding="utf-8", errors="surrogateescape")
+            if old_path in text:
+                hive.write_text(
+                    text.replace(old_path, new_path),
+                    encoding="utf-8",
+                    errors="surrogateescape"
+                )
+
+    # Shell folders link into the user's home, and links may point into the
+    # prefix the template was made from
+    retarget = [
+        (Path(metadata["prefix"]), location.absolute()),
+        (Path(metadata["home"]), Path.home()),
+    ]
+    for dir_path, dir_names, file_names in os.walk(prefix / "drive_c" / "users"):
+        # Links to directories are listed, but not followed
+        for name in dir_names + file_names:
+            link = Path(dir_path) / name
+            if not link.is_symlink():
+                continue
+            target = Path(os.readlink(link))
+            if not target.is_absolute():
+                continue
+            for old, new in retarget:
+                if old != new and target.is_relative_to(old):
+                    link.unlink()
+                    link.symlink_to(new / target.relative_to(old))
+                    break
+
+
+def clone(app: App) -> bool:
+    """Creates the wineprefix from its wine build's template, if there is one
+
+    Returns:
+        bool - whether the prefix was created. If not, it must be initialized
+    """
+    prefix = Path(app.conf.wine_prefix)
+    if prefix.exists() and any(prefix.iterdir()):
+        logging.debug(f"Not cloning a wineprefix template into non-empty {prefix}")
+        return False
+    key = fingerprint(app)
+    if key is None:
+        return False
+    template_dir = _template_dir(key)
+    metadata = _load_metadata(template_dir)
+    if metadata is None:
+        logging.debug(f"No wineprefix template for this wine build ({key})")
+        return False
+
+    app.status("Creating wineprefix from template…")
+    temp_prefix = prefix.with_name(f".{prefix.name}.{os.getpid()}.tmp")
+    try:
+        strategies = placement.copy_tree(
+            template_dir / _PREFIX,
+            temp_prefix,
+            symlinks=True
+        )
+        _fix_up(temp_prefix, prefix, metadata)
+        if prefix.exists():
+            prefix.rmdir()
+        os.rename(temp_prefix, prefix)
+    except OSError as e:
+        logging.warning(f"Failed to create wineprefix from template: {e}")
+        shutil.rmtree(temp_prefix, ignore_errors=True)
+        return False
+    logging.info(f"Created {prefix} from template {template_dir}: {dict(strategies)}")  # noqa: E501
+    try:
+        metadata["last_used"] = time.time()
+        _save_metadata(template_dir, metadata)
+    except OSError as e:
+        logging.debug(f"Failed to update wineprefix template metadata: {e}")
+    return True
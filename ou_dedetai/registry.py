@@ -0,0 +1,240 @@
+"""Reads a wineprefix's registry straight from its hive files.
+
+Wine keeps the registry in text files in the prefix: system.reg for
+HKEY_LOCAL_MACHINE and user.reg for HKEY_CURRENT_USER. Reading them needs no wine
+process or running wineserver, so a value costs microseconds rather than a wine
+startup.
+
+Hives are parsed once per change (by mtime and size) and kept in memory. Only the
+key headers are parsed up front, a key's values are parsed when first read.
+
+Note that the wineserver writes changes to the hives periodically and when it
+exits, so while wine is running a value just set may not be there yet.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+RegistryValue = str | int | bytes | list[str]
+"""REG_SZ and REG_EXPAND_SZ are str, REG_DWORD and REG_QWORD int, REG_MULTI_SZ
+list[str], anything else bytes"""
+
+_HIVES = {
+    "HKEY_LOCAL_MACHINE": "system.reg",
+    "HKLM": "system.reg",
+    "HKEY_CURRENT_USER": "user.reg",
+    "HKCU": "user.reg",
+}
+
+_ESCAPES = {
+    "a": "\a",
+    "b": "\b",
+    "e": "\x1b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+    "0": "\0",
+}
+
+_REG_EXPAND_SZ = 2
+_REG_BINARY = 3
+_REG_MULTI_SZ = 7
+_REG_QWORD = 11
+
+
+class RegistryError(ValueError):
+    """The hive couldn't be parsed"""
+
+
+def _parse_string(text: str, pos: int) -> tuple[str, int]:
+    """Parses the quoted string starting at text[pos], unescaping it as wine
+    escapes it
+
+    Returns:
+        tuple - the string and the position after its closing quote
+    """
+    if text[pos] != '"':
+        raise RegistryError(f"Expected a string: {text}")
+    chars: list[str] = []
+    pos += 1
+    while pos < len(text):
+        char = text[pos]
+        if char == '"':
+            return "".join(chars), pos + 1
+        if char == "\\" and pos + 1 < len(text):
+            pos += 1
+            char = text[pos]
+            if char == "x":
+                # Up to four hex digits
+                end = pos + 1
+                while end < len(text) and end - pos <= 4 and text[end] in "0123456789abcdefABCDEF":  # noqa: E501
+                    end += 1
+                chars.append(chr(int(text[pos + 1:end], 16)))
+                pos = end
+                continue
+            chars.append(_ESCAPES.get(char, char))
+        else:
+            chars.append(char)
+        pos += 1
+    raise RegistryError(f"Unterminated string: {text}")
+
+
+def _parse_hex(data: str) -> bytes:
+    return bytes(int(byte, 16) for byte in data.split(",") if byte.strip())
+
+
+def _parse_data(data: str) -> RegistryValue:
+    """Parses what follows the = of a value line"""
+    if data.startswith('"'):
+        value, _ = _parse_string(data, 0)
+        return value
+    if data.startswith("dword:"):
+        return int(data[6:], 16)
+    if data.startswith("str("):
+        kind, _, rest = data.partition("):")
+        value, _ = _parse_string(rest, 0)
+        if int(kind[4:], 16) == _REG_MULTI_SZ:
+            return [part for part in value.split("\0") if part]
+        return value
+    if data.startswith("hex"):
+        kind, _, rest = data.partition(":")
+        raw = _parse_hex(rest)
+        reg_type = _REG_BINARY
+        if kind.startswith("hex("):
+            reg_type = int(kind[4:-1], 16)
+        if reg_type == _REG_QWORD:
+            return int.from_bytes(raw, "little")
+        if reg_type == _REG_EXPAND_SZ:
+            return raw.decode("utf-16-le").rstrip("\0")
+        if reg_type == _REG_MULTI_SZ:
+            return [part for part in raw.decode("utf-16-le").split("\0") if part]
+        return raw
+    raise RegistryError(f"Unknown value data: {data}")
+
+
+def _parse_values(lines: list[str]) -> dict[str, RegistryValue]:
+    """Parses a key's value lines, by lowercased name ("@" is the default value)"""
+    values: dict[str, RegistryValue] = {}
+    for line in lines:
+        if line.startswith("@="):
+            name, data = "@", line[2:]
+        else:
+            name, end = _parse_string(line, 0)
+            if line[end:end + 1] != "=":
+                raise RegistryError(f"Expected a value: {line}")
+            data = line[end + 1:]
+        values[name.lower()] = _parse_data(data)
+    return values
+
+
+class Hive:
+    """The keys of one hive file"""
+    def __init__(self, text: str) -> None:
+        self._sections: dict[str, list[str]] = {}
+        """Raw value lines, by lowercased key path"""
+        self._values: dict[str, dict[str, RegistryValue]] = {}
+        """Parsed values, filled in as keys are read"""
+        lines: Optional[list[str]] = None
+        continued = ""
+        for line in text.splitlines():
+            if continued:
+                line = continued + line.lstrip()
+                continued = ""
+            if line.endswith("\\") and lines is not None and '=hex' in line:
+                # Long binary values continue on the next line
+                continued = line[:-1]
+                continue
+            if line.startswith("["):
+                header = line[1:].rpartition("]")[0]
+                key = header.replace("\\\\", "\\").lower()
+                lines = self._sections.setdefault(key, [])
+            elif lines is not None and (line.startswith('"') or line.startswith("@=")):  # noqa: E501
+                lines.append(line)
+
+    def get(self, key: str, name: str) -> Optional[RegistryValue]:
+        """Returns the value, or None if it or its key isn't set
+
+        Args:
+            key - path of the key within the hive, e.g. Software\\Wine\\Fonts
+            name - name of the value, or "@" for the key's default value
+        """
+        key = key.strip("\\").lower()
+        values = self._values.get(key)
+        if values is None:
+            lines = self._sections.get(key)
+            if lines is None:
+                return None
+            values = _parse_values(lines)
+            self._values[key] = values
+        return values.get(name.lower())
+
+
+_cache: dict[Path, tuple[tuple[int, int], Hive]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_hive(path: Path) -> Hive:
+    """Returns the parsed hive, parsing it again only if it changed
+
+    Raises:
+        OSError - if the hive can't be read
+        RegistryError - if it can't be parsed
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    with open(path, "r", encoding="utf-8", errors="surrogateescape") as f:
+        text = f.read()
+    if not text.startswith("WINE REGISTRY"):
+        raise RegistryError(f"{path} isn't a wine registry hive")
+    hive = Hive(text)
+    with _cache_lock:
+        _cache[path] = (version, hive)
+    logging.debug(f"Parsed registry hive {path}")
+    return hive
+
+
+def get_value(wine_prefix: str, key: str, name: str) -> Optional[RegistryValue]:
+    """Reads a value from the prefix's registry
+
+    Args:
+        key - full path of the key, e.g. HKCU\\Software\\Wine\\Fonts
+        name - name of the value, or "@" for the key's default value
+
+    Returns:
+        The value, or None if it or its key isn't set
+
+    Raises:
+        OSError - if the hive can't be read
+        RegistryError - if the hive can't be parsed, or the key isn't in a hive
+            this module reads
+    """
+    root, _, path = key.partition("\\")
+    hive_name = _HIVES.get(root.upper())
+    if hive_name is None:
+        raise RegistryError(f"Unsupported registry root: {root}")
+    try:
+        return load_hive(Path(wine_prefix) / hive_name).get(path, name)
+    except RegistryError:
+        raise
+    except (ValueError, IndexError) as e:
+        raise RegistryError(f"Failed to parse {key}\\{name}: {e}") from e
+
+
+def format_value(value: RegistryValue) -> str:
+    """Formats a value the way `reg query` prints it"""
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, bytes):
+        return value.hex().upper()
+    if isinstance(value, list):
+        return "\\0".join(value)
+    return value
@@ -0,0 +1,214 @@
+"""Pre-staging newer releases of the installed product.
+
+While the product runs, a background thread looks in the release catalog for a
+release newer than the one installed. If there is one, its installer is
+downloaded and verified at idle I/O priority and recorded as staged. The next
+--run-installed-app installs it before launching, so updating doesn't wait on the
+download.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import psutil
+
+from ou_dedetai.app import App
+from ou_dedetai.catalog import parse_version
+
+from . import constants
+from . import network
+from . import store
+from . import wine
+
+
+def _load() -> Optional[dict]:
+    """Returns the staged release's product, version, release, file and sha256"""
+    try:
+        with open(constants.STAGED_UPDATE_PATH, "r") as f:
+            staged: dict = json.load(f)
+        return staged
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Failed to read staged update, ignoring it: {e}")
+        return None
+
+
+def _save(staged: Optional[dict]):
+    path = Path(constants.STAGED_UPDATE_PATH)
+    if staged is None:
+        path.unlink(missing_ok=True)
+        return
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(exist_ok=True, parents=True)
+        with temp_path.open("w") as f:
+            json.dump(staged, f, indent=4, sort_keys=True)
+        os.replace(temp_path, path)
+    except OSError as e:
+        temp_path.unlink(missing_ok=True)
+        logging.warning(f"Failed to save staged update: {e}")
+
+
+def staged_sha256() -> Optional[str]:
+    """Digest of the staged installer, if any, so it's kept in the download cache"""
+    staged = _load()
+    if staged is None:
+        return None
+    return staged.get("sha256")
+
+
+def _lower_io_priority():
+    """Puts the calling thread in the idle I/O class, so it only uses the disk when
+    nothing else does"""
+    try:
+        # On Linux the I/O priority is per thread, so this leaves the rest alone
+        psutil.Process(threading.get_native_id()).ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (AttributeError, OSError, psutil.Error) as e:
+        logging.debug(f"Failed to lower I/O priority: {e}")
+
+
+def _not_updating_reason(app: App) -> Optional[str]:
+    """Returns why the installed release mustn't be updated, None if it may be"""
+    if not app.conf.faithlife_product_update_staging:
+        return "update staging isn't enabled"
+    if (
+        app.conf._overrides.faithlife_installer_name is not None
+        or app.conf._overrides.faithlife_installer_download_url is not None
+    ):
+        # The release is pinned to the installer the user gave
+        return "a custom installer was given"
+    return None
+
+
+def newer_release(app: App) -> Optional[str]:
+    """Returns the newest release in the catalog if it's newer than the installed one
+    """
+    installed = app.conf.installed_faithlife_product_release
+    if installed is None:
+        return None
+    newer = app.conf.faithlife_product_catalog.newer_than(installed)
+    if len(newer) == 0:
+        return None
+    return newer[0]
+
+
+def stage_update(app: App):
+    """Downloads and verifies the installer of a newer release, if there is one
+
+    Meant to run in a background thread.
+    """
+    reason = _not_updating_reason(app)
+    if reason is not None:
+        logging.debug(f"Not staging updates, {reason}")
+        return
+    _lower_io_priority()
+    try:
+        release = newer_release(app)
+    except Exception as e:
+        logging.debug(f"Failed to check for a newer release to stage: {e}")
+        return
+    if release is None:
+        return
+    staged = _load()
+    if (
+        staged is not None
+        and staged["release"] == release
+        and network.FileProps(staged["file"]).sha256 == staged["sha256"]
+    ):
+        logging.debug(f"Release {release} is already staged")
+        return
+
+    logging.info(f"Staging {app.conf.faithlife_product} {release} in the background")
+    try:
+        file_path = network.reuse_or_download(
+            app.conf.faithlife_installer_download_url_for(release),
+            app.conf.faithlife_installer_name_for(release),
+            app=app,
+            status_messages=False
+        )
+    except network.NotEnoughDiskSpace as e:
+        logging.warning(f"Not staging {app.conf.faithlife_product} {release}: {e}")  # noqa: E501
+        return
+    if file_path is None:
+        logging.warning(f"Failed to stage {app.conf.faithlife_product} {release}")
+        return
+    _save({
+        "faithlife_product": app.conf.faithlife_product,
+        "faithlife_product_version": app.conf.faithlife_product_version,
+        "release": release,
+        "file": str(file_path),
+        "sha256": network.FileProps(file_path).sha256,
+    })
+    logging.info(f"Staged {app.conf.faithlife_product} {release}, it will be installed on next run")  # noqa: E501
+
+
+def apply_staged_update(app: App) -> bool:
+    """Installs the staged release, if it's still newer than the installed one
+
+    Returns:
+        bool - whether a release was installed
+    """
+    staged = _load()
+    if staged is None:
+        return False
+    release = staged["release"]
+    reason = _not_updating_reason(app)
+    if reason is not None:
+        logging.info(f"Not installing staged release {release}, {reason}")
+        if not app.conf.faithlife_product_update_staging:
+            # Otherwise it's kept in the download cache for nothing
+            _save(None)
+        return False
+    installed = app.conf.installed_faithlife_product_release
+    if installed is None:
+        return False
+    # Compared without the catalog, so launching never waits on the network
+    if (
+        staged["faithlife_product"] != app.conf.faithlife_product
+        or staged["faithlife_product_version"] != app.conf.faithlife_product_version
+        or parse_version(release) <= parse_version(installed)
+    ):
+        logging.debug(f"Discarding staged release {release}, it no longer applies")
+        _save(None)
+        return False
+    if network.FileProps(staged["file"]).sha256 != staged["sha256"]:
+        logging.warning(f"Discarding staged release {release}, its installer changed")  # noqa: E501
+        _save(None)
+        return False
+    wine_release, _ = wine.get_wine_release(app.conf.wine_binary)
+    good_wine, reason = wine.check_wine_rules(
+        wine_release,
+        release,
+        app.conf.faithlife_product_version
+    )
+    if not good_wine:
+        # Kept staged, it can be installed once wine is updated
+        logging.warning(f"Not installing staged release {release}: {reason}")
+        return False
+
+    app.status(f"Updating {app.conf.faithlife_product} to {release}…")
+    previous_release = app.conf.faithlife_product_release
+    app.conf.faithlife_product_release = release
+    store.artifact_store.place_file(
+        staged["file"],
+        Path(app.conf.install_dir) / "data" / app.conf.faithlife_installer_name
+    )
+    process = wine.install_msi(app)
+    if process:
+        process.wait()
+    wine.wineserver_wait(app)
+    _save(None)
+    # Clear installed version cache
+    app.conf._installed_faithlife_product_release = None
+    installed = app.conf.installed_faithlife_product_release
+    if installed is None or parse_version(installed) != parse_version(release):
+        logging.error(f"Failed to update {app.conf.faithlife_product} to {release}")
+        app.conf.faithlife_product_release = previous_release
+        return False
+    app.status(f"Updated {app.conf.faithlife_product} to {release}.")
+    return True
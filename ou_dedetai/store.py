@@ -0,0 +1,303 @@
+"""Content-addressed store for downloaded artifacts.
+
+Every verified download is kept once, named by its sha256, and the places it is
+used (the download directory, the install's data and bin directories, etc.) get a
+reflink or hardlink to that one copy instead of a full copy of their own.
+
+An index records each artifact's size, when it was last used and where it was
+placed in the cache. The cache is kept within its byte budget by evicting the
+least recently used artifacts, decided from the index alone.
+"""
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional, TextIO
+
+from ou_dedetai.app import App
+
+from . import constants
+from . import network
+from . import placement
+from . import staging
+
+
+class ArtifactStore:
+    """Verified files keyed by their sha256 digest"""
+    def __init__(self, path: str | Path, cache_dir: str | Path) -> None:
+        self.path = Path(path)
+        self.cache_dir = Path(cache_dir)
+        """Copies placed under here are part of the cache, and evicted along with
+        the artifact"""
+        self._index_path = self.path / "index.json"
+        self._index: Optional[dict[str, dict]] = None
+        self._lock = threading.RLock()
+        self._lock_file: Optional[TextIO] = None
+        """Open while this process holds the index lock"""
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Holds the index lock, shared with other processes using the store, so
+        the index can be read, changed and written without losing their changes
+        """
+        with self._lock:
+            if self._lock_file is not None:
+                # Already held by this thread
+                yield
+                return
+            self.path.mkdir(exist_ok=True, parents=True)
+            lock_path = self._index_path.with_name(f"{self._index_path.name}.lock")
+            with open(lock_path, "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_file = lock_file
+                try:
+                    yield
+                finally:
+                    self._lock_file = None
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.path / sha256
+
+    def _load_index(self) -> dict[str, dict]:
+        """Returns each artifact's size, last_used time and cache paths by sha256"""
+        if self._index is None:
+            self._index = {}
+            try:
+                with self._index_path.open("r") as f:
+                    index: dict[str, dict] = json.load(f)
+                # Drop artifacts that were removed behind our back
+                self._index = {
+                    sha256: entry for sha256, entry in index.items()
+                    if self._blob_path(sha256).is_file()
+                }
+            except FileNotFoundError:
+                pass
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Failed to read {self._index_path}, starting over: {e}")  # noqa: E501
+        return self._index
+
+    def _save_index(self):
+        index = self._load_index()
+        temp_path = self._index_path.with_name(f".{self._index_path.name}.{os.getpid()}.tmp")  # noqa: E501
+        try:
+            self.path.mkdir(exist_ok=True, parents=True)
+            with temp_path.open("w") as f:
+                json.dump(index, f, indent=4, sort_keys=True)
+            os.replace(temp_path, self._index_path)
+        except OSError as e:
+            temp_path.unlink(missing_ok=True)
+            logging.warning(f"Failed to write {self._index_path}: {e}")
+
+    def _touch(self, sha256: str, placed_at: Optional[Path] = None):
+        """Marks an artifact as just used, recording placed_at if it's in the cache
+        """
+        with self._locked():
+            # Other processes may have used the store since, don't lose their changes
+            self._index = None
+            entry = self._load_index().setdefault(sha256, {"paths": []})
+            entry["size"] = self._blob_path(sha256).stat().st_size
+            entry["last_used"] = time.time()
+            if placed_at is not None:
+                placed_at = placed_at.absolute()
+                if (
+                    placed_at.is_relative_to(self.cache_dir)
+                    and str(placed_at) not in entry["paths"]
+                ):
+                    entry["paths"].append(str(placed_at))
+            self._save_index()
+
+    def has(self, sha256: str) -> bool:
+        """Whether the store holds an intact copy of the file with this digest"""
+        blob = self._blob_path(sha256)
+        if not blob.is_file():
+            return False
+        # Cheap unless the blob changed since it was hashed, as it's in the hash index
+        if network.FileProps(blob).sha256 == sha256:
+            return True
+        logging.warning(f"Removing damaged artifact {blob}")
+        blob.unlink(missing_ok=True)
+        return False
+
+    def add(self, file_path: Path) -> str:
+        """Adds a (verified) file to the store if it isn't already
+
+        Returns:
+            str - the file's sha256, which it can be placed with
+        """
+        file_props = network.FileProps(file_path)
+        sha256 = file_props.sha256
+        if sha256 is None:
+            raise FileNotFoundError(file_path)
+        if not self.has(sha256):
+            blob = self._blob_path(sha256)
+            self.path.mkdir(exist_ok=True, parents=True)
+            strategy = placement.place_file(file_path, blob, hardlink=True)
+            logging.debug(f"Stored {file_path} as {blob} ({strategy})")
+            # Saves hashing the blob again, it has the same contents
+            network.file_hash_cache.set(blob, md5=file_props.md5, sha256=sha256)
+        self._touch(sha256, file_path)
+        return sha256
+
+    def place(self, sha256: str, dst: Path, hardlink: bool = True) -> str:
+        """Puts the stored file at dst, sharing the stored copy's data if possible
+
+        Args:
+            hardlink - whether dst may be a hardlink to the stored copy. Pass False
+                if dst's metadata (e.g. its mode) or contents will be changed, as
+                the stored copy would change too
+
+        Returns:
+            str - how it was placed, see placement
+        """
+        blob = self._blob_path(sha256)
+        if hardlink and dst.exists() and os.path.samefile(blob, dst):
+            strategy = placement.HARDLINK
+        else:
+            strategy = placement.place_file(blob, dst, hardlink=hardlink)
+        self._touch(sha256, dst)
+        return strategy
+
+    def place_file(
+        self,
+        src: Path | str,
+        dst: Path | str,
+        hardlink: bool = True
+    ) -> str:
+        """Stores src and places it at dst. If dst is a directory, src's name is
+        kept
+
+        See place for hardlink.
+
+        Returns:
+            str - how it was placed, see placement
+        """
+        src = Path(src)
+        dst = Path(dst)
+        if dst.is_dir():
+            dst = dst / src.name
+        if hardlink and dst.exists() and os.path.samefile(src, dst):
+            self.add(src)
+            return placement.HARDLINK
+        return self.place(self.add(src), dst, hardlink=hardlink)
+
+    def entries(self) -> list[dict]:
+        """Returns the index entry of each artifact along with its sha256, least
+        recently used first"""
+        with self._lock:
+            self._index = None
+            entries = [
+                {"sha256": sha256, **entry}
+                for sha256, entry in self._load_index().items()
+            ]
+        return sorted(entries, key=lambda e: e["last_used"])
+
+    def collect(self, budget: int, pinned: set[str]) -> list[dict]:
+        """Evicts the least recently used artifacts until the store fits in budget
+
+        Args:
+            budget - total size to keep the store within, in bytes
+            pinned - sha256 digests that are never evicted
+
+        Returns:
+            list[dict] - the index entries of the evicted artifacts
+        """
+        evicted: list[dict] = []
+        with self._locked():
+            entries = self.entries()
+            total = sum(entry["size"] for entry in entries)
+            for entry in entries:
+                if total <= budget:
+                    break
+                if entry["sha256"] in pinned:
+                    continue
+                self._evict(entry)
+                total -= entry["size"]
+                evicted.append(entry)
+            if evicted:
+                self._save_index()
+        return evicted
+
+    def _evict(self, entry: dict):
+        sha256 = entry["sha256"]
+        logging.info(f"Evicting {sha256} from the download cache: {entry['paths']}")
+        for path in map(Path, entry["paths"]):
+            # The name may have been reused for a different file since
+            if path.is_file() and network.FileProps(path).sha256 == sha256:
+                path.unlink()
+        self._blob_path(sha256).unlink(missing_ok=True)
+        del self._load_index()[sha256]
+
+
+artifact_store = ArtifactStore(constants.ARTIFACT_STORE_DIR, constants.CACHE_DIR)
+"""Downloaded artifacts shared by every install"""
+
+
+def pinned_artifacts(app: App) -> set[str]:
+    """Returns the sha256 of each artifact the current install references
+
+    Only looks at what's already configured, so it never prompts.
+    """
+    paths: list[Path] = []
+    raw = app.conf._raw
+    if raw.faithlife_product is not None and raw.faithlife_product_release is not None:
+        installer_name = app.conf.faithlife_installer_name
+        paths.append(Path(app.conf.download_dir) / installer_name)
+        if raw.install_dir is not None:
+            paths.append(Path(raw.install_dir) / "data" / installer_name)
+    if raw.wine_binary is not None and app.conf.wine_appimage_path is not None:
+        paths.append(app.conf.wine_appimage_path)
+    try:
+        paths.append(
+            Path(app.conf.download_dir) / app.conf.icu_latest_version_file_name
+        )
+    except Exception as e:
+        logging.debug(f"Not pinning the ICU files, failed to find their name: {e}")
+    pinned = set()
+    # Downloaded ahead of time, to be installed on the next run
+    staged = staging.staged_sha256()
+    if staged is not None:
+        pinned.add(staged)
+    for path in paths:
+        if path.is_file():
+            sha256 = network.FileProps(path.resolve()).sha256
+            if sha256 is not None:
+                pinned.add(sha256)
+    return pinned
+
+
+def collect_garbage(app: App, keep: Optional[set] = None) -> list[dict]:
+    """Keeps the download cache within app.conf.download_cache_budget, never
+    evicting what the current install references
+
+    Args:
+        keep - sha256 digests of further artifacts not to evict
+
+    Returns:
+        list[dict] - the index entries of the evicted artifacts
+    """
+    evicted = artifact_store.collect(
+        app.conf.download_cache_budget,
+        pinned_artifacts(app) | (keep or set())
+    )
+    if evicted:
+        freed = sum(entry["size"] for entry in evicted)
+        logging.info(f"Freed {freed} bytes from the download cache")
+    return evicted
+
+
+def cache_stats(app: App) -> dict:
+    """Summarizes the download cache for display"""
+    entries = artifact_store.entries()
+    pinned = pinned_artifacts(app)
+    return {
+        "artifacts": len(entries),
+        "size": sum(entry["size"] for entry in entries),
+        "pinned": len([e for e in entries if e["sha256"] in pinned]),
+        "budget": app.conf.download_cache_budget,
+        "entries": entries,
+    }
@@ -0,0 +1,163 @@
+"""Download telemetry: live progress events and a per-host throughput history.
+
+While a file downloads, the download engine sends DownloadEvents to
+App.download_progress, which passes them on to any subscribed hooks and shows a
+summary as the status. When it finishes (or fails) the download is recorded in a
+history kept in the cache directory, so slow hosts can be spotted across runs.
+
+The history is shown with --download-stats.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from . import constants
+
+
+@dataclass
+class DownloadEvent:
+    """The state of a download as it progresses"""
+    url: str
+    host: Optional[str]
+    """Host the data is coming from, after any redirects"""
+    name: Optional[str]
+    """Name of the file being written, if any"""
+    done: int
+    """Bytes of the file written so far, including any reused from earlier"""
+    total_size: Optional[int]
+    transferred: int
+    """Bytes received over the network so far"""
+    elapsed: float
+    """Seconds since the download started"""
+    rate: Optional[float]
+    """Recent throughput in bytes per second"""
+    average_rate: Optional[float]
+    """Throughput in bytes per second since the download started"""
+    eta: Optional[float]
+    """Seconds until the download is expected to finish"""
+    retries: int
+    finished: bool = False
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.total_size:
+            return None
+        return self.done / self.total_size
+
+    def describe(self) -> str:
+        """Returns a one line summary, e.g.
+        "Downloading foo.msi: 10.0 MiB of 200.0 MiB at 4.2 MiB/s, 45s left"
+        """
+        # Imported here, utils imports most of the package
+        from ou_dedetai.utils import format_bytes
+        verb = "Downloaded" if self.finished else "Downloading"
+        message = f"{verb} {self.name or self.url}: {format_bytes(self.done)}"
+        if self.total_size and not self.finished:
+            message += f" of {format_bytes(self.total_size)}"
+        # Once finished, the recent rate says little about the whole download
+        rate = self.average_rate if self.finished else self.rate
+        # Nothing to show if all of it was reused from an earlier attempt
+        if rate:
+            message += f" at {format_bytes(round(rate))}/s"
+        if self.eta is not None and not self.finished:
+            message += f", {format_duration(self.eta)} left"
+        if self.retries > 0:
+            message += f" ({self.retries} retries)"
+        return message
+
+
+def format_duration(seconds: float) -> str:
+    """Formats a duration for display, e.g. 1h02m, 3m05s or 12s"""
+    seconds = round(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02}s"
+    return f"{seconds}s"
+
+
+def _read_history(path: Path) -> dict[str, list[dict]]:
+    try:
+        with path.open("r") as f:
+            history: dict[str, list[dict]] = json.load(f)
+        return history
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Failed to read {path}, starting over: {e}")
+        return {}
+
+
+def load_history() -> dict[str, list[dict]]:
+    """Returns the recorded downloads by host, oldest first"""
+    return _read_history(Path(constants.DOWNLOAD_HISTORY_PATH))
+
+
+def record_download(event: DownloadEvent, ok: bool):
+    """Adds a finished (or failed) download to its host's history
+
+    Only the latest constants.DOWNLOAD_HISTORY_LENGTH downloads of each host are
+    kept. Other processes may record downloads at the same time, so writers are
+    serialized with a lock file.
+    """
+    path = Path(constants.DOWNLOAD_HISTORY_PATH)
+    record = {
+        "time": time.time(),
+        "url": event.url,
+        "bytes": event.transferred,
+        "seconds": round(event.elapsed, 3),
+        "retries": event.retries,
+        "ok": ok,
+    }
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(exist_ok=True, parents=True)
+        with open(path.with_name(f"{path.name}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            history = _read_history(path)
+            records = history.setdefault(event.host or "unknown", [])
+            records.append(record)
+            del records[:-constants.DOWNLOAD_HISTORY_LENGTH]
+            with temp_path.open("w") as f:
+                json.dump(history, f, indent=4, sort_keys=True)
+            os.replace(temp_path, path)
+    except OSError as e:
+        temp_path.unlink(missing_ok=True)
+        logging.warning(f"Failed to record download history: {e}")
+
+
+def host_stats() -> list[dict]:
+    """Summarizes the history of each host, slowest first
+
+    Each summary has the host, its number of downloads and failures, the bytes
+    received, the throughput over all its downloads and over the most recent ones
+    (in bytes per second, None if unknown) and when it was last used.
+    """
+    stats = []
+    for host, records in load_history().items():
+        if len(records) == 0:
+            continue
+        recent = records[-constants.DOWNLOAD_HISTORY_RECENT:]
+        stats.append({
+            "host": host,
+            "downloads": len(records),
+            "failures": len([r for r in records if not r["ok"]]),
+            "bytes": sum(r["bytes"] for r in records),
+            "rate": _throughput(records),
+            "recent_rate": _throughput(recent),
+            "last_used": records[-1]["time"],
+        })
+    return sorted(stats, key=lambda s: s["rate"] or 0)
+
+
+def _throughput(records: list[dict]) -> Optional[float]:
+    seconds = sum(r["seconds"] for r in records)
+    if seconds <= 0:
+        return None
+    return float(sum(r["bytes"] for r in records) / seconds)
@@ -159,18 +159,6 @@ def get_current_logos_version(logos_appdata_dir: Optional[str]) -> Optional[str]
     return None
 
 
-def check_logos_release_version(version, threshold, check_version_part):
-    if version is not None:
-        version_parts = list(map(int, version.split('.')))
-        return version_parts[check_version_part - 1] < threshold
-    else:
-        return False
-
-
-def filter_versions(versions, threshold, check_version_part):
-    return [version for version in versions if check_logos_release_version(version, threshold, check_version_part)]  # noqa: E501
-
-
 def get_winebin_code_and_desc(app: App, binary) -> Tuple[str, str | None]:
     """Gets the type of wine in use and it's description
     
@@ -276,6 +264,20 @@ def enough_disk_space(dest_dir, bytes_required):
     return free_bytes > bytes_required
 
 
+def format_bytes(size: int) -> str:
+    """Formats a size in bytes for display, e.g. 1.5 GiB"""
+    value = float(size)
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if value < 1024:
+            break
+        value /= 1024
+    else:
+        unit = "TiB"
+    if unit == "B":
+        return f"{size} B"
+    return f"{value:.1f} {unit}"
+
+
 def get_path_size(file_path):
     file_path = Path(file_path)
     if not file_path.exists():
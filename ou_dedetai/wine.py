@@ -1,18 +1,85 @@
 from dataclasses import dataclass
+import errno
+import fcntl
 import logging
 import os
 import shutil
 import subprocess
 from pathlib import Path
 import tempfile
+import threading
+import time
 from typing import Optional
 
 from ou_dedetai import constants
 from ou_dedetai.app import App
 
+from . import catalog
 from . import network
+from . import registry
 from . import system
 from . import utils
+from . import winepath
+
+
+@dataclass
+class WineStats:
+    """Wine processes started by this process, and the seconds they ran for"""
+    spawns: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return f"{self.spawns} wine processes started, {self.seconds:.1f}s in wine"
+
+
+stats = WineStats()
+_stats_lock = threading.Lock()
+
+
+def _record(seconds: float, spawns: int = 1):
+    with _stats_lock:
+        stats.spawns += spawns
+        stats.seconds += seconds
+
+
+def _track(process: subprocess.Popen):
+    """Records the process in stats once it exits"""
+    started = time.monotonic()
+
+    def _wait():
+        process.wait()
+        _record(time.monotonic() - started)
+    threading.Thread(target=_wait, name="Wine process tracker", daemon=True).start()
+
+
+def run_wine_command(app: App, exe: str, exe_args: list[str]) -> tuple[int, str]:
+    """Runs a wine program to completion
+
+    Returns:
+        tuple - the exit code and output of the program
+
+    Raises:
+        OSError - if wine couldn't be started
+    """
+    command = [app.conf.wine64_binary, exe, *exe_args]
+    logging.debug(f"subprocess cmd: '{' '.join(command)}'")
+    started = time.monotonic()
+    try:
+        with open(app.conf.app_wine_log_path, 'a') as wine_log:
+            print(f"{utils.get_timestamp()}: {' '.join(command)}", file=wine_log)
+            wine_log.flush()
+            result = subprocess.run(
+                command,
+                env=get_wine_env(app),
+                stdout=subprocess.PIPE,
+                stderr=wine_log,
+                encoding=app.conf._wine_output_encoding or 'utf-8',
+                errors='replace'
+            )
+    finally:
+        _record(time.monotonic() - started)
+    return result.returncode, result.stdout
+
 
 def check_wineserver(app: App):
     # FIXME: if the wine version changes, we may need to restart the wineserver
@@ -29,6 +96,35 @@ def check_wineserver(app: App):
         return False
 
 
+def _wineserver_running(wine_prefix: str) -> bool:
+    """Whether a wineserver is running for the prefix, without starting wine
+
+    The wineserver holds a lock on a file in its socket directory, which is named
+    after the prefix's device and inode.
+    """
+    try:
+        st = os.stat(wine_prefix)
+    except OSError:
+        return False
+    lock_path = (
+        Path(f"/tmp/.wine-{os.getuid()}")
+        / f"server-{st.st_dev:x}-{st.st_ino:x}"
+        / "lock"
+    )
+    try:
+        fd = os.open(lock_path, os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        fcntl.lockf(fd, fcntl.LOCK_UN)
+        return False
+    except OSError as e:
+        return e.errno in [errno.EACCES, errno.EAGAIN]
+    finally:
+        os.close(fd)
+
+
 def wineserver_kill(app: App):
     if check_wineserver(app):
         process = run_wine_proc(app.conf.wineserver_binary, app, exe_args=["-k"])
@@ -122,7 +218,7 @@ def check_wine_rules(
     # commits in time.
     logging.debug(f"Checking {wine_release} for {release_version}.")
     if faithlife_product_version == "10":
-        if release_version is not None and utils.check_logos_release_version(release_version, 30, 1): #noqa: E501
+        if catalog.is_older_than(release_version, 30):
             required_wine_minimum = [7, 18]
         else:
             required_wine_minimum = [9, 10]
@@ -247,32 +343,82 @@ def set_win_version(app: App, exe: str, windows_version: str):
     if exe == "logos":
         # This operation is equivilent to f"winetricks -q settings {windows_version}"
         # but faster
-        process = run_wine_proc(
-            app.conf.wine_binary,
-            app,
-            exe_args=('winecfg', '/v', windows_version)
-        )
-        if process:
-            process.wait()
+        returncode, _ = run_wine_command(app, 'winecfg', ['/v', windows_version])
+        if returncode != 0:
+            logging.warning(f"Failed to set windows version: winecfg exited with {returncode}")  # noqa: E501
 
     elif exe == "indexer":
-        reg = f"HKCU\\Software\\Wine\\AppDefaults\\{app.conf.faithlife_product}Indexer.exe"  # noqa: E501
-        exe_args = [
-            'add',
-            reg,
-            "/v", "Version",
-            "/t", "REG_SZ",
-            "/d", f"{windows_version}", "/f",
-            ]
-        process = run_wine_proc(
-            app.conf.wine_binary,
-            app,
-            exe='reg',
-            exe_args=exe_args
-        )
-        if process is None:
-            app.exit("Failed to spawn command to set windows version for indexer")
-        process.wait()
+        reg = f"HKEY_CURRENT_USER\\Software\\Wine\\AppDefaults\\{app.conf.faithlife_product}Indexer.exe"  # noqa: E501
+        changeset = RegistryChangeset()
+        changeset.set(reg, "Version", windows_version)
+        changeset.apply(app, app.conf.wine64_binary)
+
+
+class RegistryChangeset:
+    """Registry values to set, applied together in a single regedit import
+
+    Values are strings (REG_SZ) or ints (REG_DWORD), keyed by their full key path
+    (e.g. HKEY_CURRENT_USER\\Software\\Wine) and name.
+    """
+    def __init__(self) -> None:
+        self.values: dict[str, dict[str, str | int]] = {}
+
+    def set(self, key: str, name: str, value: str | int) -> "RegistryChangeset":
+        self.values.setdefault(key, {})[name] = value
+        return self
+
+    def __len__(self) -> int:
+        return sum(len(values) for values in self.values.values())
+
+    @staticmethod
+    def _escape(text: str) -> str:
+        return text.replace("\\", "\\\\").replace('"', '\\"')
+
+    @classmethod
+    def _format(cls, name: str, value: str | int) -> str:
+        """Formats a value as a line of a .reg file"""
+        if isinstance(value, int):
+            data = f"dword:{value:08x}"
+        else:
+            data = f'"{cls._escape(value)}"'
+        return f'"{cls._escape(name)}"={data}'
+
+    def to_reg(self) -> str:
+        """Returns the changes as a .reg file for regedit"""
+        lines = ["REGEDIT4", ""]
+        for key, values in self.values.items():
+            lines.append(f"[{key}]")
+            lines.extend(self._format(name, value) for name, value in values.items())
+            lines.append("")
+        return "\n".join(lines)
+
+    def is_applied(self, wine_prefix: str) -> bool:
+        """Whether every value is already set, read straight from the prefix's
+        hives so no wine process is needed. False if that can't be told"""
+        try:
+            return all(
+                registry.get_value(wine_prefix, key, name) == value
+                for key, values in self.values.items()
+                for name, value in values.items()
+            )
+        except (OSError, registry.RegistryError) as e:
+            logging.debug(f"Failed to check the registry: {e}")
+            return False
+
+    def apply(self, app: App, wine64_binary: str) -> bool:
+        """Imports the values with one regedit and waits for wine to write them,
+        unless they're all set already
+
+        Returns:
+            bool - whether anything was imported
+        """
+        if len(self) == 0:
+            return False
+        if self.is_applied(app.conf.wine_prefix):
+            logging.debug(f"Registry values are already set: {self.values}")
+            return False
+        wine_reg_install(app, "changeset.reg", self.to_reg(), wine64_binary)
+        return True
 
 
 def wine_reg_install(app: App, name: str, reg_text: str, wine64_binary: str):
@@ -301,27 +447,53 @@ def wine_reg_install(app: App, name: str, reg_text: str, wine64_binary: str):
             reg_file.unlink()
 
 
-def disable_winemenubuilder(app: App, wine64_binary: str):
-    name='disable-winemenubuilder.reg'
-    reg_text = r'''REGEDIT4
+def _apply_or_add(
+    app: App,
+    wine64_binary: str,
+    changes: RegistryChangeset,
+    changeset: Optional[RegistryChangeset]
+):
+    """Adds changes to changeset if one is given, otherwise applies them now"""
+    if changeset is None:
+        changes.apply(app, wine64_binary)
+    else:
+        for key, values in changes.values.items():
+            for name, value in values.items():
+                changeset.set(key, name, value)
 
-[HKEY_CURRENT_USER\Software\Wine\DllOverrides]
-"winemenubuilder.exe"=""
-'''
-    wine_reg_install(app, name, reg_text, wine64_binary)
 
+def disable_winemenubuilder(
+    app: App,
+    wine64_binary: str,
+    changeset: Optional[RegistryChangeset] = None
+):
+    changes = RegistryChangeset().set(
+        r"HKEY_CURRENT_USER\Software\Wine\DllOverrides",
+        "winemenubuilder.exe",
+        ""
+    )
+    _apply_or_add(app, wine64_binary, changes, changeset)
 
-def set_renderer(app: App, wine64_binary: str, value: str):
-    name=f'set-renderer-to-{value}.reg'
-    reg_text = rf'''REGEDIT4
 
-[HKEY_CURRENT_USER\Software\Wine\Direct3D]
-"renderer"="{value}"
-'''
-    wine_reg_install(app, name, reg_text, wine64_binary)
+def set_renderer(
+    app: App,
+    wine64_binary: str,
+    value: str,
+    changeset: Optional[RegistryChangeset] = None
+):
+    changes = RegistryChangeset().set(
+        r"HKEY_CURRENT_USER\Software\Wine\Direct3D",
+        "renderer",
+        value
+    )
+    _apply_or_add(app, wine64_binary, changes, changeset)
 
 
-def set_fontsmoothing_to_rgb(app: App, wine64_binary: str):
+def set_fontsmoothing_to_rgb(
+    app: App,
+    wine64_binary: str,
+    changeset: Optional[RegistryChangeset] = None
+):
     # Possible registry values:
     # "disable":      FontSmoothing=0; FontSmoothingOrientation=1; FontSmoothingType=0
     # "gray/grey":    FontSmoothing=2; FontSmoothingOrientation=1; FontSmoothingType=1
@@ -329,16 +501,13 @@ def set_fontsmoothing_to_rgb(app: App, wine64_binary: str):
     # "rgb":          FontSmoothing=2; FontSmoothingOrientation=1; FontSmoothingType=2
     # https://github.com/Winetricks/winetricks/blob/8cf82b3c08567fff6d3fb440cbbf61ac5cc9f9aa/src/winetricks#L17411
 
-    name='set-fontsmoothing-to-rgb.reg'
-    reg_text = r'''REGEDIT4
-
-[HKEY_CURRENT_USER\Control Panel\Desktop]
-"FontSmoothing"="2"
-"FontSmoothingGamma"=dword:00000578
-"FontSmoothingOrientation"=dword:00000001
-"FontSmoothingType"=dword:00000002
-'''
-    wine_reg_install(app, name, reg_text, wine64_binary)
+    key = r"HKEY_CURRENT_USER\Control Panel\Desktop"
+    changes = RegistryChangeset()
+    changes.set(key, "FontSmoothing", "2")
+    changes.set(key, "FontSmoothingGamma", 0x578)
+    changes.set(key, "FontSmoothingOrientation", 1)
+    changes.set(key, "FontSmoothingType", 2)
+    _apply_or_add(app, wine64_binary, changes, changeset)
 
 
 def install_msi(app: App):
@@ -353,16 +522,10 @@ def install_msi(app: App):
 
     # Add MST transform if needed
     release_version = app.conf.installed_faithlife_product_release or app.conf.faithlife_product_version  # noqa: E501
-    if release_version is not None and utils.check_logos_release_version(release_version, 39, 1): #noqa: E501
+    if catalog.is_older_than(release_version, 39):
         # Define MST path and transform to windows path.
         mst_path = constants.APP_ASSETS_DIR / "LogosStubFailOK.mst"
-        # FIXME: move this to run_wine_proc after types are cleaner
-        transform_winpath = subprocess.run(
-            [wine_exe, 'winepath', '-w', mst_path],
-            env=system.fix_ld_library_path(get_wine_env(app)),
-            capture_output=True,
-            text=True,
-        ).stdout.rstrip()
+        transform_winpath = winepath.to_windows(app.conf.wine_prefix, mst_path)
         exe_args.append(f'TRANSFORMS={transform_winpath}')
         logging.debug(f"TRANSFORMS windows path added: {transform_winpath}")
 
@@ -413,7 +576,7 @@ def run_wine_proc(
     try:
         with open(app.conf.app_wine_log_path, 'a') as wine_log:
             print(f"{utils.get_timestamp()}: {cmd}", file=wine_log)
-            return system.popen_command(
+            process = system.popen_command(
                 command,
                 stdout=wine_log,
                 stderr=wine_log,
@@ -421,6 +584,9 @@ def run_wine_proc(
                 start_new_session=True,
                 encoding='utf-8'
             )
+            if process is not None:
+                _track(process)
+            return process
 
     except subprocess.CalledProcessError as e:
         logging.error(f"Exception running '{' '.join(command)}': {e}")
@@ -439,11 +605,7 @@ def run_wine_proc(
 def enforce_icu_data_files(app: App):
     app.status("Downloading ICU files…")
     icu_url = app.conf.icu_latest_version_url
-    icu_latest_version = app.conf.icu_latest_version
-
-    icu_filename = os.path.basename(icu_url).removesuffix(".tar.gz")
-    # Append the version to the file name so it doesn't collide with previous versions
-    icu_filename = f"{icu_filename}-{icu_latest_version}.tar.gz"
+    icu_filename = app.conf.icu_latest_version_file_name
     network.logos_reuse_download(
         icu_url,
         icu_filename,
@@ -468,10 +630,25 @@ def enforce_icu_data_files(app: App):
 
 def get_registry_value(reg_path, name, app: App):
     logging.debug(f"Get value for: {reg_path=}; {name=}")
+    # Read from the hives if possible, it's much faster than starting wine
+    try:
+        hive_value = registry.get_value(app.conf.wine_prefix, reg_path, name)
+        if hive_value is not None:
+            formatted = registry.format_value(hive_value)
+            logging.debug(f"Registry value: {formatted}")
+            return formatted
+        # A running wineserver may not have written a value just set yet
+        if not _wineserver_running(app.conf.wine_prefix):
+            logging.debug(f"Registry value not set: {reg_path}\\{name}")
+            return None
+        logging.debug("Registry value not in the hive yet, asking wine")
+    except (OSError, registry.RegistryError) as e:
+        logging.debug(f"Failed to read the registry hive, asking wine: {e}")
+
     # FIXME: consider breaking run_wine_proc into a helper function before decoding is attempted # noqa: E501
     # NOTE: Can't use run_wine_proc here because of infinite recursion while
     # trying to determine wine_output_encoding.
-    value = None
+    value: Optional[str] = None
     env = get_wine_env(app)
 
     cmd = [
@@ -482,6 +659,7 @@ def get_registry_value(reg_path, name, app: App):
     encoding = app.conf._wine_output_encoding
     if encoding is None:
         encoding = 'UTF-8'
+    started = time.monotonic()
     try:
         result = system.run_command(
             cmd,
@@ -492,6 +670,8 @@ def get_registry_value(reg_path, name, app: App):
         if 'non-zero exit status' in str(e):
             logging.warning(err_msg)
             return None
+    finally:
+        _record(time.monotonic() - started)
     if result is not None and result.stdout is not None:
         for line in result.stdout.splitlines():
             if line.strip().startswith(name):
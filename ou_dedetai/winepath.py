@@ -0,0 +1,140 @@
+"""Translates paths between Unix and a wineprefix's Windows drives, like
+`wine winepath` but without starting wine.
+
+Wine maps drive letters to Unix directories with the symlinks in
+`<prefix>/dosdevices` (c: -> ../drive_c, z: -> / and so on). These are read once
+and read again only when the directory changes. Translations are cached too.
+
+If the prefix has no dosdevices yet, the drives wine creates by default (c: and
+z:) are assumed.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import Optional
+
+
+class _Drives:
+    """The drives of one prefix, and the translations made with them"""
+    def __init__(self, wine_prefix: str) -> None:
+        self.wine_prefix = wine_prefix
+        self.version: Optional[int] = None
+        """mtime of dosdevices when the drives were read"""
+        self.roots: dict[str, str] = {}
+        """Unix directory of each drive, by lowercase letter"""
+        self.to_windows: dict[str, str] = {}
+        self.to_unix: dict[str, str] = {}
+
+    def refresh(self):
+        dosdevices = Path(self.wine_prefix) / "dosdevices"
+        try:
+            version: Optional[int] = dosdevices.stat().st_mtime_ns
+        except OSError:
+            version = None
+        if self.roots and version == self.version:
+            return
+        roots: dict[str, str] = {}
+        if version is not None:
+            try:
+                for entry in os.scandir(dosdevices):
+                    # Skip the devices themselves, e.g. c:: and com1
+                    name = entry.name.lower()
+                    if len(name) == 2 and name[1] == ":" and entry.is_symlink():
+                        roots[name[0]] = os.path.realpath(entry.path)
+            except OSError as e:
+                logging.debug(f"Failed to read {dosdevices}: {e}")
+        if not roots:
+            roots = {
+                "c": os.path.realpath(Path(self.wine_prefix) / "drive_c"),
+                "z": "/",
+            }
+        self.version = version
+        self.roots = roots
+        self.to_windows = {}
+        self.to_unix = {}
+
+
+_drives: dict[str, _Drives] = {}
+_lock = threading.Lock()
+
+
+def _get_drives(wine_prefix: str) -> _Drives:
+    """Must be called with _lock held"""
+    drives = _drives.get(wine_prefix)
+    if drives is None:
+        drives = _drives[wine_prefix] = _Drives(wine_prefix)
+    drives.refresh()
+    return drives
+
+
+def to_windows(wine_prefix: str, unix_path: str | Path) -> str:
+    """Translates a Unix path to the Windows path wine sees it as, like
+    `winepath -w`
+
+    The drive with the deepest directory containing the path is used. Paths on
+    no drive are given wine's \\\\?\\unix\\ form.
+    """
+    unix_path = str(unix_path)
+    with _lock:
+        drives = _get_drives(wine_prefix)
+        cached = drives.to_windows.get(unix_path)
+        if cached is not None:
+            return cached
+        resolved = PurePosixPath(os.path.realpath(unix_path))
+        best: Optional[tuple[str, PurePosixPath]] = None
+        for letter, root in sorted(drives.roots.items()):
+            root_path = PurePosixPath(root)
+            if resolved.is_relative_to(root_path) and (
+                best is None or len(root_path.parts) > len(best[1].parts)
+            ):
+                best = (letter, root_path)
+        if best is None:
+            windows_path = "\\\\?\\unix" + str(resolved).replace("/", "\\")
+        else:
+            letter, root_path = best
+            relative = resolved.relative_to(root_path)
+            windows_path = f"{letter.upper()}:\\" + "\\".join(relative.parts)
+        drives.to_windows[unix_path] = windows_path
+        return windows_path
+
+
+def _match_case(directory: Path, name: str) -> str:
+    """Returns the entry of directory named name, ignoring case as Windows does.
+    name itself if there's no such entry"""
+    if (directory / name).exists():
+        return name
+    try:
+        for entry in os.scandir(directory):
+            if entry.name.lower() == name.lower():
+                return entry.name
+    except OSError:
+        pass
+    return name
+
+
+def to_unix(wine_prefix: str, windows_path: str) -> Optional[str]:
+    """Translates a Windows path in the prefix to a Unix path, like `winepath -u`
+
+    Returns:
+        str - None if the path isn't on a drive the prefix has
+    """
+    with _lock:
+        drives = _get_drives(wine_prefix)
+        cached = drives.to_unix.get(windows_path)
+        if cached is not None:
+            return cached
+        if windows_path.startswith("\\\\?\\unix\\"):
+            unix_path = windows_path[len("\\\\?\\unix"):].replace("\\", "/")
+        else:
+            path = PureWindowsPath(windows_path)
+            root = drives.roots.get(path.drive[:1].lower()) if path.drive else None
+            if root is None:
+                return None
+            current = Path(root)
+            for part in path.parts[1:]:
+                current = current / _match_case(current, part)
+            unix_path = str(current)
+        drives.to_unix[windows_path] = unix_path
+        return unix_path
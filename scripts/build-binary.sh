@@ -12,4 +12,6 @@ fi
 python3 -m pip install .
 # Build the installer binary
 pyinstaller --clean --log-level DEBUG ou_dedetai.spec
+# Publish block checksums alongside, so updates only download what changed
+python3 -m ou_dedetai.delta dist/oudedetai
 cd "$start_dir"
\ No newline at end of file